@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+
+# a cache of parsed commits that is kept between runs in the git directory of the repo, like gitk's gitk.cache
+# commits never change once written, so only the commits that are new since the cached ref heads are read from git
+
+import heapq
+import os
+import sqlite3
+import gitlog
+
+cacheVersion = 2
+cacheFileName = 'git-view-cache.sqlite'
+defaultMaxEntries = 250000
+
+# opens the cache of the repo at path, or an empty one in a temporary file if it is not enabled, so that the commits are not held in memory
+# a cache that cannot be written, like in a read-only repo, is replaced by an empty one too
+def openCache (path, enabled = True):
+	fileName = ''
+	if enabled:
+		gitDir = gitlog.findGitDir(path)
+		if gitDir is not None:
+			fileName = os.path.join(gitDir, cacheFileName)
+	try:
+		return openDatabase(fileName)
+	except sqlite3.OperationalError as error:
+		if fileName == '':
+			raise
+		print('Warning: the cache ' + fileName + ' cannot be used (' + str(error) + '), so the commits are read without it.')
+		return openDatabase('')
+
+def openDatabase (fileName):
+	db = sqlite3.connect(fileName)
+	try:
+		db.execute('create table if not exists info (key text primary key, value integer)')
+		row = db.execute("select value from info where key = 'version'").fetchone()
+		if row is None or row[0] != cacheVersion:
+			db.execute('drop table if exists commits')
+			db.execute('drop table if exists refs')
+			db.execute("delete from info where key = 'horizon'")
+			db.execute("insert or replace into info values ('version', ?)", (cacheVersion,))
+		db.execute('create table if not exists commits (name text primary key, parents text, date integer, author text, message text, commitdate integer, used integer)')
+		db.execute('create table if not exists refs (name text primary key, head text)')
+		row = db.execute("select value from info where key = 'stamp'").fetchone()
+		stamp = (row[0] if row is not None else 0) + 1 # which run last used each commit, for eviction
+		db.execute("insert or replace into info values ('stamp', ?)", (stamp,))
+		db.commit()
+		row = db.execute("select value from info where key = 'horizon'").fetchone()
+	except sqlite3.OperationalError:
+		db.close()
+		raise
+	cache = {}
+	cache['db'] = db
+	cache['stamp'] = stamp
+	# every commit reachable from the cached refs that is not in the cache is no newer than this commit date, see readWalk
+	cache['horizon'] = (row[0] if row is not None else 0)
+	return cache
+
+# evicts the least recently used commits past maxEntries, and writes the cache
+# the cache stays open so that a long running view can keep updating from it
+def saveCache (cache, maxEntries = defaultMaxEntries):
+	db = cache['db']
+	numEntries = db.execute('select count(*) from commits').fetchone()[0]
+	if numEntries > maxEntries:
+		addHorizon(cache, db.execute('select max(commitdate) from (select commitdate from commits order by used limit ?)', (numEntries - maxEntries,)).fetchone()[0])
+		db.execute('delete from commits where name in (select name from commits order by used limit ?)', (numEntries - maxEntries,))
+	db.execute("insert or replace into info values ('horizon', ?)", (cache['horizon'],))
+	db.commit()
+
+def closeCache (cache, maxEntries = defaultMaxEntries):
+	saveCache(cache, maxEntries)
+	cache['db'].close()
+
+# adds [name, parents, date, author, message, commitDate] records from gitlog.readLog to the cache
+# the records are written as they come, so a generator like readLog streams straight into the cache
+def addCommits (cache, records):
+	def rows ():
+		for record in records:
+			yield (record[0], ' '.join(record[1]), record[2], record[3], record[4], record[5], cache['stamp'])
+	cache['db'].executemany('insert or replace into commits values (?, ?, ?, ?, ?, ?, ?)', rows())
+
+# returns a dict of the name of each of the given commits that is cached to its [parents, commitDate], which is all that a walk needs
+def readParents (cache, names):
+	parents = {}
+	for i in range(0, len(names), 500):
+		chunk = names[i:i + 500]
+		for row in cache['db'].execute('select name, parents, commitdate from commits where name in (' + ','.join(['?'] * len(chunk)) + ')', chunk):
+			parents[row[0]] = [row[1].split(), row[2]]
+	return parents
+
+# yields the records of the given commits from the cache, in the order given, and marks them as used in this run
+# they are read a chunk at a time, so only the chunk is held at once
+def loadRecords (cache, names):
+	db = cache['db']
+	for i in range(0, len(names), 500):
+		chunk = names[i:i + 500]
+		records = {}
+		for row in db.execute('select name, parents, date, author, message, commitdate from commits where name in (' + ','.join(['?'] * len(chunk)) + ')', chunk):
+			records[row[0]] = [row[0], row[1].split(), row[2], row[3], row[4], row[5]]
+		db.execute('update commits set used = ? where name in (' + ','.join(['?'] * len(chunk)) + ')', [cache['stamp']] + chunk)
+		for name in chunk:
+			if name in records:
+				yield records[name]
+
+# reads the newest maxCount commits reachable from the heads into the cache in one walk, where heads may be '^name' to leave out the history
+# of a commit, and returns the newest commit date that the commits past the end of the walk can have, or None if it read them all
+# git walks newest first, so the commits it did not get to are no newer than the last one it wrote, or than since
+# with until, the commits newer than that are all read, since they are not counted, and maxCount is of the older ones
+def readWalk (path, cache, heads, maxCount = None, since = None, until = None):
+	if until is not None and maxCount is not None:
+		readWalk(path, cache, heads, None, (until + 1 if since is None else max(since, until + 1)))
+		if since is not None and since > until:
+			return since
+	numRead = 0
+	lastDate = None
+	def counted (records):
+		nonlocal numRead, lastDate
+		for record in records:
+			numRead += 1
+			lastDate = record[5]
+			yield record
+	addCommits(cache, counted(gitlog.readLog(path, heads, maxCount, True, since, (until if maxCount is not None else None))))
+	if maxCount is None or numRead < maxCount:
+		return since
+	return lastDate
+
+# raises cache['horizon'] to the date, if it is newer, when commits that may be that new are left out of the cache
+def addHorizon (cache, date):
+	if date is not None and date > cache['horizon']:
+		cache['horizon'] = date
+
+# stores the current ref heads, given as [refName, commitName] from gitlog.readRefs, and reads the commits that are new since the cached heads
+# the commits that were only reachable from heads that were deleted or force-pushed away are dropped
+# returns a dict of the names of the refs that moved forward since the cached heads, to their cached heads
+# with since and until, unix times, the new commits older than since are left to be read when they are needed, and maxCount is of
+# the commits no newer than until, like readCommits
+def updateRefs (path, cache, refs, maxCount = None, since = None, until = None):
+	db = cache['db']
+	oldHeads = dict(db.execute('select name, head from refs').fetchall())
+	newHeads = dict(refs)
+	heads = list(set(newHeads.values()))
+	movedHeads = []
+	movedForward = {}
+	for refName in oldHeads:
+		if newHeads.get(refName) == oldHeads[refName]:
+			continue
+		if refName in newHeads and gitlog.isAncestor(path, oldHeads[refName], newHeads[refName]):
+			movedForward[refName] = oldHeads[refName] # fast-forwarded, so nothing was dropped
+			continue
+		movedHeads.append(oldHeads[refName])
+	movedHeads = list(set(movedHeads))
+	if len(movedHeads) > 0:
+		orphans = gitlog.streamGit(path, 'rev-list --ignore-missing --stdin', b'\n', ('\n'.join(movedHeads + ['^' + head for head in heads]) + '\n').encode('UTF-8'))
+		db.executemany('delete from commits where name = ?', ((name.decode('ascii'),) for name in orphans if name != b''))
+	cachedHeads = readParents(cache, heads)
+	# the heads that were there before and are not cached are past the horizon, and the heads in the commit-graph are walked from it by
+	# readCommits instead, so their history may be missing from the cache
+	oldHeadNames = set(oldHeads.values())
+	newCommitHeads = []
+	for head in heads:
+		if head not in cachedHeads and head not in oldHeadNames:
+			graphCommit = gitlog.readGraphCommit(path, head)
+			if graphCommit is None:
+				newCommitHeads.append(head)
+			else:
+				addHorizon(cache, graphCommit[1])
+	if len(newCommitHeads) > 0:
+		addHorizon(cache, readWalk(path, cache, newCommitHeads + ['^' + head for head in oldHeadNames], maxCount, since, until))
+	db.execute('delete from refs')
+	db.executemany('insert into refs values (?, ?)', refs)
+	return movedForward
+
+# yields the records of the newest maxCount commits reachable from the heads, newest first like git log
+# the walk is done over the cache and the commit-graph, if read natively, and git is only asked for the commits past the edge of those
+# and for the details of the commits found only in the commit-graph
+# the commits past the edge are read together once the walk could reach them, which it cannot while it still has commits newer than
+# cache['horizon'], so a cold cache is read in the one walk of updateRefs, and past the horizon, git walks the rest of maxCount in one go
+# with since and until, unix times, the walk stops at commits older than since, and commits newer than until are still returned,
+# since they connect the heads to the older ones, but are not counted in maxCount, and without countMerges neither are merges
+# the walk keeps only the names of the commits, and once it is done, the records are read back from the cache as they are taken
+def readCommits (path, cache, heads, maxCount = None, since = None, until = None, countMerges = True):
+	yield from loadRecords(cache, walkCommits(path, cache, heads, maxCount, since, until, countMerges))
+
+# returns the names of the commits of readCommits in order, with all of them in the cache
+# known, if given, returns a dict of the name of each of the given commits that it has to its [parents, commitDate], like readParents,
+# for a walk over commits that are already in memory, and the cache is only asked for the rest
+def walkCommits (path, cache, heads, maxCount, since, until, countMerges, known = None):
+	order = []
+	needDetails = [] # the commits found only in the commit-graph
+	seen = set()
+	waiting = [] # [-commitDate, name, parents, True if only in the commit-graph] of the commits still to be walked
+	missing = {} # the names of the commits in neither to the newest commit date they can have
+	horizon = cache['horizon'] # the commits that the walk can reach and are not cached are no newer than this
+	def visit (names, childDate):
+		names = [name for name in dict.fromkeys(names) if name not in seen]
+		seen.update(names)
+		cached = (known(names) if known is not None else {})
+		cached.update(readParents(cache, [name for name in names if name not in cached]))
+		for name in names:
+			if name in cached:
+				heapq.heappush(waiting, [-cached[name][1], name, cached[name][0], False])
+				continue
+			graphCommit = gitlog.readGraphCommit(path, name)
+			if graphCommit is not None:
+				heapq.heappush(waiting, [-graphCommit[1], name, graphCommit[0], True])
+			else:
+				missing[name] = (min(childDate, horizon) if childDate is not None else horizon)
+	visit(heads, None)
+	numCounted = 0
+	while maxCount is None or numCounted < maxCount:
+		# a parent is not newer than its child, so missing commits are only read once the walk could reach them
+		if len(missing) > 0 and (len(waiting) == 0 or -waiting[0][0] < max(missing.values())):
+			# past the horizon, git is given the commits still to be walked too, so that it walks the rest in one go,
+			# and whatever it did not get to is no newer than where it stopped
+			wholeWalk = (len(waiting) == 0 or -waiting[0][0] < horizon)
+			readHorizon = readWalk(path, cache, list(missing) + ([entry[1] for entry in waiting] if wholeWalk else []), (None if maxCount is None else maxCount - numCounted), since, until)
+			addHorizon(cache, readHorizon)
+			if readHorizon is not None:
+				horizon = (min(horizon, readHorizon) if wholeWalk else max(horizon, readHorizon))
+			found = readParents(cache, list(missing))
+			for name in list(missing):
+				if name in found:
+					heapq.heappush(waiting, [-found[name][1], name, found[name][0], False])
+					del missing[name]
+				elif readHorizon is not None and (since is None or readHorizon > since):
+					missing[name] = min(readHorizon, missing[name]) # the walk was cut short before it, so it is read later if still needed
+				else:
+					del missing[name] # not in the repo, or older than since
+		if len(waiting) == 0 or (since is not None and -waiting[0][0] < since):
+			break
+		(negativeDate, name, parents, graphOnly) = heapq.heappop(waiting)
+		order.append(name)
+		if graphOnly:
+			needDetails.append(name)
+		if (until is None or -negativeDate <= until) and (countMerges or len(parents) < 2):
+			numCounted += 1
+		visit(parents, -negativeDate)
+	# when the walk started from every ref, what it was told by git is how far the cache reaches now
+	if set(heads).issuperset([row[0] for row in cache['db'].execute('select head from refs')]):
+		cache['horizon'] = horizon
+	if len(needDetails) > 0:
+		addCommits(cache, gitlog.readLog(path, needDetails, None, False))
+	return order
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+
+# a compact store of commits for git-view.py and node-view.py, with an array per field instead of a dict per commit
+# commits are numbered in the order they are added, names are kept as binary shas in one buffer, messages are kept encoded
+# until asked for, and parents and children are kept as arrays of numbers, so large histories can be walked without making objects
+
+import array
+import heapq
+
+def newStore ():
+	store = {}
+	store['nameLength'] = 20 # 32 for sha256 repos, set by the first commit added
+	store['names'] = bytearray() # the binary name of commit i at i * nameLength
+	store['dates'] = array.array('q')
+	store['commitDates'] = array.array('q')
+	store['authors'] = [] # each author once
+	store['authorOf'] = array.array('l') # the index in authors of the author of each commit
+	store['messages'] = bytearray()
+	store['messageStarts'] = array.array('q', [0]) # the messages of commit i are messages[messageStarts[i]:messageStarts[i + 1]]
+	store['stubs'] = bytearray() # 1 for the parents that were never added themselves, which have only a name
+	store['parentStarts'] = array.array('l', [0]) # the parents of commit i are parentIndices[parentStarts[i]:parentStarts[i + 1]]
+	store['parentIndices'] = array.array('l')
+	store['childStarts'] = array.array('l', [0])
+	store['childIndices'] = array.array('l')
+	store['sortedIndices'] = array.array('l') # the commits in order of their names, for find
+	# only kept while adding, until finishStore
+	store['indexOf'] = {}
+	store['authorIndexOf'] = {}
+	store['parentNames'] = bytearray()
+	return store
+
+# adds a commit, if it is not already in the store, and returns its index
+def addCommit (store, name, parents, date, author, message, commitDate = 0):
+	return addBinaryCommit(store, bytes.fromhex(name), b''.join([bytes.fromhex(parentName) for parentName in parents]), len(parents), date, author, message.encode('UTF-8'), commitDate)
+
+# adds a commit given by its binary name, the binary names of its parents one after another, and its encoded message
+def addBinaryCommit (store, key, parentKeys, numParents, date, author, message, commitDate):
+	if key in store['indexOf']:
+		return store['indexOf'][key]
+	if len(store['indexOf']) == 0:
+		store['nameLength'] = len(key)
+	index = len(store['indexOf'])
+	store['indexOf'][key] = index
+	store['names'] += key
+	store['dates'].append(date)
+	store['commitDates'].append(commitDate)
+	if author not in store['authorIndexOf']:
+		store['authorIndexOf'][author] = len(store['authors'])
+		store['authors'].append(author)
+	store['authorOf'].append(store['authorIndexOf'][author])
+	store['messages'] += message
+	store['messageStarts'].append(len(store['messages']))
+	store['stubs'].append(0)
+	store['parentNames'] += parentKeys
+	store['parentStarts'].append(store['parentStarts'][-1] + numParents)
+	return index
+
+# adds commit i of another finished store, without decoding it, and returns its index
+def copyCommit (store, source, i):
+	nameLength = source['nameLength']
+	names = source['names']
+	parentKeys = b''.join([names[p * nameLength:(p + 1) * nameLength] for p in parents(source, i)])
+	return addBinaryCommit(store, bytes(names[i * nameLength:(i + 1) * nameLength]), parentKeys, numParents(source, i), source['dates'][i], author(source, i), source['messages'][source['messageStarts'][i]:source['messageStarts'][i + 1]], source['commitDates'][i])
+
+# adds [name, parents, date, author, message, commitDate] records like those from gitlog.readLog
+def addRecords (store, records):
+	for record in records:
+		addCommit(store, record[0], record[1], record[2], record[3], record[4], record[5])
+
+# links each commit to its parents and children, with the parents that were not added becoming stubs at the end,
+# and drops what was only needed while adding
+def finishStore (store):
+	nameLength = store['nameLength']
+	indexOf = store['indexOf']
+	parentNames = store['parentNames']
+	numAdded = len(store['stubs'])
+	parentIndices = store['parentIndices']
+	for i in range(0, len(parentNames), nameLength):
+		key = bytes(parentNames[i:i + nameLength])
+		if key not in indexOf:
+			indexOf[key] = len(store['stubs'])
+			store['names'] += key
+			store['dates'].append(0)
+			store['commitDates'].append(0)
+			store['authorOf'].append(-1)
+			store['messageStarts'].append(len(store['messages']))
+			store['stubs'].append(1)
+		parentIndices.append(indexOf[key])
+	numCommits = len(store['stubs'])
+	for i in range(numAdded, numCommits):
+		store['parentStarts'].append(store['parentStarts'][-1])
+	# the children, grouped by parent with a counting sort
+	parentStarts = store['parentStarts']
+	childStarts = array.array('l', [0]) * (numCommits + 1)
+	for parentIndex in parentIndices:
+		childStarts[parentIndex + 1] += 1
+	for i in range(0, numCommits):
+		childStarts[i + 1] += childStarts[i]
+	childIndices = array.array('l', [0]) * len(parentIndices)
+	filled = array.array('l', childStarts[:-1])
+	for i in range(0, numCommits):
+		for j in range(parentStarts[i], parentStarts[i + 1]):
+			childIndices[filled[parentIndices[j]]] = i
+			filled[parentIndices[j]] += 1
+	store['childStarts'] = childStarts
+	store['childIndices'] = childIndices
+	store['sortedIndices'] = array.array('l', sorted(range(0, numCommits), key = lambda i : store['names'][i * nameLength:(i + 1) * nameLength]))
+	store['indexOf'] = {}
+	store['authorIndexOf'] = {}
+	store['parentNames'] = bytearray()
+
+def count (store):
+	return len(store['stubs'])
+
+# returns a dict of the binary name of each commit that is not a stub to its index, for finding many commits at once
+def commitIndices (store):
+	nameLength = store['nameLength']
+	names = store['names']
+	stubs = store['stubs']
+	return dict([(bytes(names[i * nameLength:(i + 1) * nameLength]), i) for i in range(0, count(store)) if stubs[i] == 0])
+
+# returns the index of the commit, or -1 if it is not in the store
+def find (store, name):
+	try:
+		key = bytes.fromhex(name)
+	except ValueError:
+		return -1
+	nameLength = store['nameLength']
+	names = store['names']
+	sortedIndices = store['sortedIndices']
+	low = 0
+	high = len(sortedIndices)
+	while low < high:
+		mid = (low + high) // 2
+		i = sortedIndices[mid]
+		midKey = names[i * nameLength:(i + 1) * nameLength]
+		if midKey < key:
+			low = mid + 1
+		elif midKey > key:
+			high = mid
+		else:
+			return i
+	return -1
+
+def name (store, i):
+	return store['names'][i * store['nameLength']:(i + 1) * store['nameLength']].hex()
+
+def isStub (store, i):
+	return store['stubs'][i] == 1
+
+def date (store, i):
+	return store['dates'][i]
+
+def setDate (store, i, date):
+	store['dates'][i] = date
+
+def commitDate (store, i):
+	return store['commitDates'][i]
+
+def author (store, i):
+	return (store['authors'][store['authorOf'][i]] if store['authorOf'][i] >= 0 else '')
+
+def message (store, i):
+	return store['messages'][store['messageStarts'][i]:store['messageStarts'][i + 1]].decode('UTF-8')
+
+def parents (store, i):
+	return store['parentIndices'][store['parentStarts'][i]:store['parentStarts'][i + 1]]
+
+def numParents (store, i):
+	return store['parentStarts'][i + 1] - store['parentStarts'][i]
+
+def numChildren (store, i):
+	return store['childStarts'][i + 1] - store['childStarts'][i]
+
+# returns the commits in an order where every commit comes before all of its parents
+# if byDate, the newest of the commits that are ready comes first, like git log --date-order
+def childrenFirst (store, byDate = False):
+	dates = store['dates']
+	parentStarts = store['parentStarts']
+	parentIndices = store['parentIndices']
+	childStarts = store['childStarts']
+	numCommits = count(store)
+	waitingChildren = array.array('l', [childStarts[i + 1] - childStarts[i] for i in range(0, numCommits)])
+	order = array.array('l')
+	if byDate:
+		ready = [(-dates[i], i) for i in range(0, numCommits) if waitingChildren[i] == 0]
+		heapq.heapify(ready)
+	else:
+		ready = [i for i in range(0, numCommits) if waitingChildren[i] == 0]
+	while len(ready) > 0:
+		i = (heapq.heappop(ready)[1] if byDate else ready.pop())
+		order.append(i)
+		for j in range(parentStarts[i], parentStarts[i + 1]):
+			parentIndex = parentIndices[j]
+			waitingChildren[parentIndex] -= 1
+			if waitingChildren[parentIndex] == 0:
+				if byDate:
+					heapq.heappush(ready, (-dates[parentIndex], parentIndex))
+				else:
+					ready.append(parentIndex)
+	return order
+
+# returns a list of the bits of each commit and all of its ancestors ORed together
+# bits is a dict of commit index to its own bits, so with a bit per column this gives the columns each commit reaches
+def reachableBits (store, bits):
+	parentStarts = store['parentStarts']
+	parentIndices = store['parentIndices']
+	reached = [0] * count(store)
+	for i in reversed(childrenFirst(store)):
+		mask = bits.get(i, 0)
+		for j in range(parentStarts[i], parentStarts[i + 1]):
+			mask |= reached[parentIndices[j]]
+		reached[i] = mask
+	return reached
+
+# returns a list of the bits of each commit and all of its descendants ORed together, the reverse of reachableBits
+# with a bit per branch head this gives the branches that have each commit, for all of the branches in one pass
+def descendantBits (store, bits):
+	childStarts = store['childStarts']
+	childIndices = store['childIndices']
+	reached = [0] * count(store)
+	for i in childrenFirst(store):
+		mask = bits.get(i, 0)
+		for j in range(childStarts[i], childStarts[i + 1]):
+			mask |= reached[childIndices[j]]
+		reached[i] = mask
+	return reached
+
+# returns a list of a bitmask for each commit with bit i set when the commit is reachable from heads[i], a commit index or -1
+# each head is walked back once, stopping at ancestors that already have its bit, so it suits a few heads over a large graph
+def labelAncestors (store, heads):
+	parentStarts = store['parentStarts']
+	parentIndices = store['parentIndices']
+	labels = [0] * count(store)
+	for h in range(0, len(heads)):
+		bit = 1 << h
+		stack = [heads[h]] if heads[h] >= 0 else []
+		while len(stack) > 0:
+			i = stack.pop()
+			if labels[i] & bit:
+				continue
+			labels[i] |= bit
+			for j in range(parentStarts[i], parentStarts[i + 1]):
+				if not labels[parentIndices[j]] & bit:
+					stack.append(parentIndices[j])
+	return labels
+
+# assigns each commit a lane, like the columns of git log --graph, in a single pass over order, which lists children before parents
+# a lane is kept for each commit that is waiting for its parent to come up in the order, and freed lanes are reused lowest first
+# returns an array of the lane of each commit, -1 for those not in order, and a dict of (child, parent) to the lane the edge runs in
+def assignLanes (store, order):
+	parentStarts = store['parentStarts']
+	parentIndices = store['parentIndices']
+	lanes = array.array('l', [-1]) * count(store)
+	edgeLanes = {}
+	waiting = {} # the parents still to come up in the order to the lane that is kept for them
+	freeLanes = []
+	numLanes = 0
+	for i in order:
+		if i in waiting:
+			lane = waiting.pop(i)
+		elif len(freeLanes) > 0:
+			lane = heapq.heappop(freeLanes)
+		else:
+			lane = numLanes
+			numLanes += 1
+		lanes[i] = lane
+		laneTaken = False
+		for j in range(parentStarts[i], parentStarts[i + 1]):
+			parentIndex = parentIndices[j]
+			if lanes[parentIndex] >= 0: # out of order, so the edge just goes back to it
+				edgeLanes[(i, parentIndex)] = lanes[parentIndex]
+				continue
+			if parentIndex not in waiting:
+				if not laneTaken:
+					waiting[parentIndex] = lane
+					laneTaken = True
+				elif len(freeLanes) > 0:
+					waiting[parentIndex] = heapq.heappop(freeLanes)
+				else:
+					waiting[parentIndex] = numLanes
+					numLanes += 1
+			edgeLanes[(i, parentIndex)] = waiting[parentIndex]
+		if not laneTaken:
+			heapq.heappush(freeLanes, lane)
+	return [lanes, edgeLanes]
+
+# returns, for each of the heads, a list of [ahead, behind] against each of the targets, like git rev-list --left-right --count
+# head...target but over the commits in the store, without the stubs, or None where the head or target is -1
+# the commits are grouped by which heads and which targets have them, so the counting is done once per group, not per commit
+def aheadBehind (store, heads, targets):
+	headBits = {}
+	validHeads = 0
+	for h in range(0, len(heads)):
+		if heads[h] >= 0:
+			headBits[heads[h]] = headBits.get(heads[h], 0) | (1 << h)
+			validHeads |= 1 << h
+	haveHeads = descendantBits(store, headBits)
+	haveTargets = labelAncestors(store, targets)
+	stubs = store['stubs']
+	groups = {}
+	for i in range(0, count(store)):
+		if not stubs[i]:
+			key = (haveHeads[i], haveTargets[i])
+			groups[key] = groups.get(key, 0) + 1
+	counts = [[([0, 0] if heads[h] >= 0 and targets[t] >= 0 else None) for t in range(0, len(targets))] for h in range(0, len(heads))]
+	# when most heads are counted, like for the old commits that every branch has, the heads that are not are taken off a base instead
+	bases = [[0, 0] for t in range(0, len(targets))]
+	for ((headMask, targetMask), numCommits) in groups.items():
+		for t in range(0, len(targets)):
+			if targets[t] < 0:
+				continue
+			if targetMask & (1 << t):
+				(mask, side) = (validHeads & ~headMask, 1) # behind, for the heads without the commits the target has
+			else:
+				(mask, side) = (headMask, 0) # ahead, for the heads with the commits the target does not have
+			add = numCommits
+			others = validHeads & ~mask
+			if bin(others).count('1') < bin(mask).count('1'):
+				bases[t][side] += numCommits
+				(mask, add) = (others, -numCommits)
+			while mask != 0:
+				low = mask & -mask
+				counts[low.bit_length() - 1][t][side] += add
+				mask ^= low
+	for h in range(0, len(heads)):
+		for t in range(0, len(targets)):
+			if counts[h][t] is not None:
+				counts[h][t][0] += bases[t][0]
+				counts[h][t][1] += bases[t][1]
+	return counts
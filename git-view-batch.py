@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+import subprocess
+import concurrent.futures
+import os
+import sys
+import time
+import html
+
+if len(sys.argv) < 3:
+	print("--Instructions--")
+	print("./git-view-batch.py <manifest-file> <maximum-number-of-commits-on-each-branch> [workers=<number>] [<git-view.py options>...]")
+	print("  Runs ./git-view.py on every repository listed in the manifest, several at a time, and writes an index page,")
+	print("    'html/index.html', that links to the view of each one and lists the ones that failed.")
+	print("  Each line of the manifest is the path of a repository, optionally followed by a name for its view, which is")
+	print("    otherwise the last part of the path. Blank lines and lines starting with '#' are skipped.")
+	print("  The view of each repository is written to 'html/<name>.html', or 'html/<name>.html.gz' with 'gzip', with its side files next to it.")
+	print("  As many repositories are done at once as there are cores, or the number given with 'workers=', and each one renders")
+	print("    its rows with a share of the cores, unless 'render-workers=' is given.")
+	print("  The other options are passed on to ./git-view.py for every repository, except 'serve' and 'output='.")
+	exit(0)
+
+manifestPath = sys.argv[1]
+numCommits = sys.argv[2]
+outputDirectory = 'html'
+gitViewPath = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'git-view.py')
+
+numWorkers = os.cpu_count() or 1
+options = []
+for arg in sys.argv[3:]:
+	if arg.startswith('workers='):
+		numWorkers = max(1, int(arg[8:]))
+	elif arg == 'serve' or arg.startswith('serve=') or arg.startswith('output='):
+		print('Ignoring ' + arg + ' for a batch.')
+	else:
+		options.append(arg)
+# each view renders its rows in worker processes too, so the cores are shared between the views unless told otherwise
+if not any([option.startswith('render-workers=') for option in options]):
+	options.append('render-workers=' + str(max(1, (os.cpu_count() or 1) // numWorkers)))
+
+def newRepo (path, name):
+	repo = {}
+	repo['path'] = path
+	repo['name'] = name
+	repo['output'] = os.path.join(outputDirectory, name + '.html' + ('.gz' if 'gzip' in options else ''))
+	repo['ok'] = False
+	repo['seconds'] = 0
+	repo['error'] = ''
+	return repo
+
+# read the manifest, giving every view its own name
+repos = []
+names = set()
+with open(manifestPath, encoding = 'UTF-8') as f:
+	for line in f:
+		line = line.strip()
+		if line == '' or line.startswith('#'):
+			continue
+		(path, sep, name) = line.partition(' ')
+		name = name.strip()
+		if name == '':
+			name = os.path.basename(os.path.normpath(path))
+		uniqueName = name
+		count = 1
+		while uniqueName in names or uniqueName == 'index':
+			count += 1
+			uniqueName = name + '-' + str(count)
+		names.add(uniqueName)
+		repos.append(newRepo(path, uniqueName))
+
+# each repository is done by its own git-view.py process, so a failure in one does not stop the others
+# the error is what it wrote to stderr, like a traceback, or otherwise the errors it printed
+def runRepo (repo):
+	start = time.time()
+	try:
+		pr = subprocess.run([sys.executable, gitViewPath, repo['path'], numCommits, 'output=' + os.path.join(outputDirectory, repo['name'] + '.html')] + options, stdout = subprocess.PIPE, stderr = subprocess.PIPE)
+		out = '\n'.join([line for line in pr.stdout.decode('UTF-8', 'replace').split('\n') if line.startswith('Error:')])
+		error = pr.stderr.decode('UTF-8', 'replace').strip()
+		repo['ok'] = (pr.returncode == 0 and os.path.isfile(repo['output']))
+		if not repo['ok']:
+			repo['error'] = (error if error != '' else out if out != '' else 'exited with ' + str(pr.returncode))
+	except OSError as error:
+		repo['error'] = str(error)
+	repo['seconds'] = time.time() - start
+	return repo
+
+if not os.path.isdir(outputDirectory):
+	os.mkdir(outputDirectory)
+start = time.time()
+with concurrent.futures.ThreadPoolExecutor(max_workers = numWorkers) as pool:
+	for repo in pool.map(runRepo, repos):
+		print(('done   ' if repo['ok'] else 'FAILED ') + repo['name'] + ' (' + format(repo['seconds'], '.1f') + 's)')
+		if not repo['ok']:
+			print('  ' + repo['error'].split('\n')[-1]) # the whole of it is on the index page
+
+# print the index page
+f = open(os.path.join(outputDirectory, 'index.html'), 'w', encoding = 'UTF-8')
+print('<html><body>', file = f)
+print('<table>', file = f)
+for repo in repos:
+	link = '<a href="' + html.escape(os.path.basename(repo['output'])) + '">' + html.escape(repo['name']) + '</a>'
+	status = ('' if repo['ok'] else '<pre style="color: red; margin: 0px;">' + html.escape(repo['error']) + '</pre>')
+	print('<tr><td>' + (link if repo['ok'] else html.escape(repo['name'])) + '</td><td>' + html.escape(repo['path']) + '</td><td>' + format(repo['seconds'], '.1f') + 's</td><td>' + status + '</td></tr>', file = f)
+print('</table>', file = f)
+print('</body></html>', file = f)
+f.close()
+
+numFailed = len([repo for repo in repos if not repo['ok']])
+print(str(len(repos)) + ' repositories in ' + format(time.time() - start, '.1f') + 's, ' + str(numFailed) + ' failed')
+exit(1 if numFailed > 0 else 0)
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+
+import subprocess
+import json
+import os
+import random
+import sys
+import time
+
+if len(sys.argv) < 2:
+	print("--Instructions--")
+	print("./git-view-bench.py <results-file> [label=<name>] [runs=<number>] [branches=<number>] [commits=<number>] [merges=<fraction>]")
+	print("    [tags=<number>] [same-second=<fraction>] [seed=<number>] [scripts=<script>,<script>,...] [<git-view.py options>...]")
+	print("  Builds a synthetic repository of the given shape, runs the views on it with 'stats', and adds a line of results for")
+	print("    each script to <results-file>, so that the runs of different versions of the scripts can be compared offline.")
+	print("  The repository has 'master', 'staging' and 'production' branches and a number of feature branches ('branches=',")
+	print("    10 by default), each with a number of commits ('commits=', 100 by default) made in an interleaved order.")
+	print("    'merges=' is the fraction of feature commits that merge master in, and of feature branches merged back into")
+	print("    master (0.1 by default), 'tags=' is how many tags are put on master (10 by default), and 'same-second=' is the")
+	print("    fraction of commits made in the same second as the one before (0.2 by default). The same 'seed=' gives the same")
+	print("    repository. Repositories are kept in 'bench/' and reused by later runs of the same shape.")
+	print("  The scripts are 'git-view' (with 'no-cache'), 'git-view-cached' (after a run that fills the cache) and 'node-view',")
+	print("    all of them by default, or the ones given with 'scripts='. Each is run 'runs=' times (3 by default) and the")
+	print("    median run is kept, with the time of each phase, how often git was run, the peak memory and the commits per second.")
+	print("  Each results line is tagged with the 'label=' given, or the current commit of the scripts, and is compared with")
+	print("    the last line for the same shape and script that has a different label.")
+	print("  The other options are passed on to ./git-view.py, like 'native' or 'no-merges'.")
+	exit(0)
+
+resultsPath = sys.argv[1]
+scriptDirectory = os.path.dirname(os.path.abspath(__file__))
+workDirectory = os.path.abspath('bench')
+
+label = None
+numRuns = 3
+seed = 1
+scriptNames = ['git-view', 'git-view-cached', 'node-view']
+shape = {}
+shape['branches'] = 10
+shape['commits'] = 100
+shape['merges'] = 0.1
+shape['tags'] = 10
+shape['sameSecond'] = 0.2
+options = []
+for arg in sys.argv[2:]:
+	if arg.startswith('label='):
+		label = arg[6:]
+	elif arg.startswith('runs='):
+		numRuns = max(1, int(arg[5:]))
+	elif arg.startswith('branches='):
+		shape['branches'] = int(arg[9:])
+	elif arg.startswith('commits='):
+		shape['commits'] = max(1, int(arg[8:]))
+	elif arg.startswith('merges='):
+		shape['merges'] = float(arg[7:])
+	elif arg.startswith('tags='):
+		shape['tags'] = int(arg[5:])
+	elif arg.startswith('same-second='):
+		shape['sameSecond'] = float(arg[12:])
+	elif arg.startswith('seed='):
+		seed = int(arg[5:])
+	elif arg.startswith('scripts='):
+		scriptNames = [scriptName for scriptName in arg[8:].split(',') if scriptName != '']
+	elif arg in ['no-cache', 'stats', 'no-fetch', 'fetch-background', 'gzip', 'serve'] or arg.startswith('serve=') or arg.startswith('output=') or arg.startswith('fetch-age=') or arg.startswith('cache-size='):
+		print('Ignoring ' + arg + ' for a benchmark.')
+	else:
+		options.append(arg)
+shape['seed'] = seed
+
+def shapeName ():
+	return 'b' + str(shape['branches']) + '-c' + str(shape['commits']) + '-m' + str(shape['merges']) + '-t' + str(shape['tags']) + '-s' + str(shape['sameSecond']) + '-r' + str(seed)
+
+def callGit (path, args, input = None):
+	pr = subprocess.run(['git'] + args, cwd = path, input = input, stdout = subprocess.PIPE, stderr = subprocess.PIPE)
+	if pr.returncode != 0:
+		print('Error: git ' + ' '.join(args) + ': ' + pr.stderr.decode('UTF-8', 'replace'))
+		exit(1)
+	return pr.stdout.decode('UTF-8', 'replace').strip()
+
+# writes the history of the synthetic repository as a git fast-import stream, so that it is built by one git process
+# the commits of master and of the feature branches are made in a shuffled order, each feature branch starting from where
+# master is when it makes its first commit
+def fastImportStream ():
+	rng = random.Random(seed)
+	out = []
+	marks = 0
+	tips = {} # the mark of the latest commit of each branch
+	masterMarks = [] # the marks of the commits of master, oldest first
+	syncedMaster = {} # the mark of master that each feature branch last started from or merged in
+	date = 1500000000
+	def commit (branchName, message, parentMarks):
+		nonlocal marks, date
+		marks += 1
+		if marks > 1 and rng.random() >= shape['sameSecond']:
+			date += rng.randint(1, 3600)
+		out.append('commit refs/heads/' + branchName + '\n')
+		out.append('mark :' + str(marks) + '\n')
+		out.append('author Bench <bench@example.com> ' + str(date) + ' +0000\n')
+		out.append('committer Bench <bench@example.com> ' + str(date) + ' +0000\n')
+		data = message.encode('UTF-8')
+		out.append('data ' + str(len(data)) + '\n' + message + '\n')
+		if len(parentMarks) > 0:
+			out.append('from :' + str(parentMarks[0]) + '\n')
+		for parentMark in parentMarks[1:]:
+			out.append('merge :' + str(parentMark) + '\n')
+		content = branchName + ' ' + str(marks) + '\n'
+		out.append('M 644 inline ' + branchName + '.txt\ndata ' + str(len(content)) + '\n' + content + '\n')
+		tips[branchName] = marks
+		return marks
+	featureNames = ['feature-' + str(b) for b in range(0, shape['branches'])]
+	events = ['master'] * (shape['commits'] - 1)
+	for featureName in featureNames:
+		events += [featureName] * shape['commits']
+	rng.shuffle(events)
+	masterMarks.append(commit('master', 'Start', []))
+	made = dict([(featureName, 0) for featureName in featureNames])
+	for branchName in events:
+		if branchName == 'master':
+			masterMarks.append(commit('master', 'Change master ' + str(len(masterMarks)), [masterMarks[-1]]))
+			continue
+		if made[branchName] == 0:
+			syncedMaster[branchName] = masterMarks[-1]
+			commit(branchName, 'Change ' + branchName + ' 0', [masterMarks[-1]])
+		elif rng.random() < shape['merges'] and syncedMaster[branchName] != masterMarks[-1]:
+			syncedMaster[branchName] = masterMarks[-1]
+			commit(branchName, 'Merge branch \'master\' into ' + branchName, [tips[branchName], masterMarks[-1]])
+		else:
+			commit(branchName, 'Change ' + branchName + ' ' + str(made[branchName]), [tips[branchName]])
+		made[branchName] += 1
+		if made[branchName] == shape['commits'] and rng.random() < shape['merges']:
+			masterMarks.append(commit('master', 'Merge branch \'' + branchName + '\'', [masterMarks[-1], tips[branchName]]))
+	# staging and production lag behind master
+	for (branchName, fraction) in [['staging', 0.9], ['production', 0.75]]:
+		out.append('reset refs/heads/' + branchName + '\nfrom :' + str(masterMarks[int((len(masterMarks) - 1) * fraction)]) + '\n\n')
+	# every other tag is annotated
+	for t in range(0, shape['tags']):
+		mark = masterMarks[rng.randrange(0, len(masterMarks))]
+		if t % 2 == 0:
+			message = 'Release ' + str(t)
+			out.append('tag v' + str(t) + '\nfrom :' + str(mark) + '\ntagger Bench <bench@example.com> ' + str(date) + ' +0000\ndata ' + str(len(message)) + '\n' + message + '\n')
+		else:
+			out.append('reset refs/tags/v' + str(t) + '\nfrom :' + str(mark) + '\n\n')
+	return ''.join(out).encode('UTF-8')
+
+# builds the repository, a bare origin and a clone of it with every branch local too and the commit-graph written, unless it was already built
+# returns the path of the clone and its number of commits
+def buildRepo ():
+	repoDirectory = os.path.join(workDirectory, shapeName())
+	originPath = os.path.join(repoDirectory, 'origin.git')
+	clonePath = os.path.join(repoDirectory, 'clone')
+	if not os.path.isdir(clonePath):
+		print('Building ' + shapeName())
+		os.makedirs(originPath)
+		callGit(originPath, ['init', '-q', '--bare'])
+		callGit(originPath, ['fast-import', '--quiet'], fastImportStream())
+		callGit(repoDirectory, ['clone', '-q', originPath, 'clone'])
+		callGit(clonePath, ['fetch', '-q', '--update-head-ok', originPath, '+refs/heads/*:refs/heads/*']) # a local branch for each, for node-view
+		callGit(clonePath, ['commit-graph', 'write', '--reachable'])
+	numCommits = int(callGit(clonePath, ['rev-list', '--count', '--all']))
+	return [clonePath, numCommits]
+
+# runs a script on the repository and returns its stats with the time the whole process took, or None if it failed
+def runScript (scriptName, clonePath, numCommits):
+	outputDirectory = os.path.join(workDirectory, 'out', scriptName)
+	os.makedirs(os.path.join(outputDirectory, 'html'), exist_ok = True)
+	if scriptName == 'node-view':
+		args = [os.path.join(scriptDirectory, 'node-view.py'), clonePath, str(numCommits), 'no-cache', 'stats']
+		statsPath = os.path.join(outputDirectory, 'html', 'git-view-stats.json')
+	else:
+		args = [os.path.join(scriptDirectory, 'git-view.py'), clonePath, str(numCommits), 'no-fetch', 'stats', 'output=' + os.path.join(outputDirectory, 'html', 'view.html')] + options
+		if scriptName == 'git-view':
+			args.append('no-cache')
+		statsPath = os.path.join(outputDirectory, 'html', 'view-stats.json')
+	if os.path.isfile(statsPath):
+		os.remove(statsPath)
+	start = time.perf_counter()
+	pr = subprocess.run([sys.executable] + args, cwd = outputDirectory, stdout = subprocess.PIPE, stderr = subprocess.STDOUT)
+	seconds = time.perf_counter() - start
+	if pr.returncode != 0 or not os.path.isfile(statsPath):
+		print('FAILED ' + scriptName + ': ' + pr.stdout.decode('UTF-8', 'replace').strip().split('\n')[-1])
+		return None
+	with open(statsPath, encoding = 'UTF-8') as f:
+		stats = json.load(f)
+	stats['processSeconds'] = seconds
+	return stats
+
+def median (values):
+	values = sorted(values)
+	return values[len(values) // 2]
+
+def newResult (scriptName, numCommits, runs):
+	middle = sorted(runs, key = lambda stats : stats['processSeconds'])[len(runs) // 2]
+	result = {}
+	result['label'] = label
+	result['time'] = int(time.time())
+	result['shape'] = shapeName()
+	result['script'] = scriptName
+	result['options'] = options
+	result['commits'] = numCommits
+	result['runs'] = len(runs)
+	result['seconds'] = middle['processSeconds']
+	result['allSeconds'] = [stats['processSeconds'] for stats in runs]
+	result['commitsPerSecond'] = numCommits / max(middle['processSeconds'], 1e-9)
+	result['peakRssKilobytes'] = max([stats['peakRssKilobytes'] for stats in runs])
+	result['peakGitRssKilobytes'] = max([stats['peakGitRssKilobytes'] for stats in runs])
+	result['phases'] = {} # the median wall seconds of each phase
+	for phase in middle['phases']:
+		result['phases'][phase['name']] = median([p['wallSeconds'] for stats in runs for p in stats['phases'] if p['name'] == phase['name']])
+	result['git'] = middle['git']
+	result['counts'] = middle['counts']
+	result['outputBytes'] = sum(middle['outputBytes'].values())
+	return result
+
+def readResults ():
+	results = []
+	if os.path.isfile(resultsPath):
+		with open(resultsPath, encoding = 'UTF-8') as f:
+			for line in f:
+				if line.strip() != '':
+					results.append(json.loads(line))
+	return results
+
+def change (new, old):
+	if old == 0:
+		return ''
+	return ' (' + format(100 * (new - old) / old, '+.1f') + '%)'
+
+if label is None:
+	pr = subprocess.run(['git', 'describe', '--always', '--dirty'], cwd = scriptDirectory, stdout = subprocess.PIPE, stderr = subprocess.DEVNULL)
+	label = (pr.stdout.decode('UTF-8', 'replace').strip() if pr.returncode == 0 else 'unlabeled')
+
+(clonePath, numCommits) = buildRepo()
+print(shapeName() + ': ' + str(numCommits) + ' commits')
+previousResults = readResults()
+numFailed = 0
+for scriptName in scriptNames:
+	if scriptName not in ['git-view', 'git-view-cached', 'node-view']:
+		print('Unknown script ' + scriptName)
+		numFailed += 1
+		continue
+	if scriptName == 'git-view-cached':
+		runScript(scriptName, clonePath, numCommits) # fills the cache
+	runs = []
+	for run in range(0, numRuns):
+		stats = runScript(scriptName, clonePath, numCommits)
+		if stats is None:
+			break
+		runs.append(stats)
+	if len(runs) < numRuns:
+		numFailed += 1
+		continue
+	result = newResult(scriptName, numCommits, runs)
+	with open(resultsPath, 'a', encoding = 'UTF-8') as f:
+		f.write(json.dumps(result) + '\n')
+	# compare with the last results of another version
+	old = None
+	for previous in previousResults:
+		if previous['shape'] == result['shape'] and previous['script'] == result['script'] and previous['options'] == result['options'] and previous['label'] != label:
+			old = previous
+	print(scriptName + ': ' + format(result['seconds'], '.3f') + 's' + (change(result['seconds'], old['seconds']) if old is not None else '') + ', ' + format(result['commitsPerSecond'], '.0f') + ' commits/s, ' + str(result['peakRssKilobytes']) + ' KB peak' + (change(result['peakRssKilobytes'], old['peakRssKilobytes']) if old is not None else '') + (', against ' + old['label'] if old is not None else ''))
+	for phaseName in result['phases']:
+		oldSeconds = (old['phases'].get(phaseName) if old is not None else None)
+		print('  ' + phaseName.ljust(10) + format(result['phases'][phaseName], '.4f') + 's' + (change(result['phases'][phaseName], oldSeconds) if oldSeconds is not None else ''))
+exit(1 if numFailed > 0 else 0)
@@ -1,19 +1,29 @@
 #!/usr/bin/env python3
 
-import subprocess
+import array
+import contextlib
 import os
 import sys
-import time
-import cgi
 import datetime
-
-gitPath = '/usr/bin/git'
+import gzip
+import html
+import base64
+import json
+import re
+import traceback
+import gitlog
+import commitcache
+import commitstore
+import viewserver
+import runstats
+import viewmatrix
+import rowrender
 
 if len(sys.argv) < 3:
 	print("--Instructions--")
-	print("./git-view.py <path-to-git-repo> <maximum-number-of-commits-on-each-branch> [no-merges] [sort-branches-by-date]")
+	print("./git-view.py <path-to-git-repo> <maximum-number-of-commits-on-each-branch> [no-merges] [sort-branches-by-date] [integration=<branch>,<branch>,...] [no-cache] [cache-size=<number-of-commits>] [gzip] [native] [serve[=<port>]] [output=<file.html>] [no-fetch] [fetch-age=<seconds>] [fetch-background] [stats] [since=<date>] [until=<date>] [page-size=<number-of-columns>] [export=jsonl,binary] [render-workers=<number>] [ahead-behind] [sort-branches-by-ahead=<branch>] [sort-branches-by-behind=<branch>]")
 	print("  The script will create an HTML file, 'html/git-view-2.html', that you can view in any browser.")
-	print("  The HTML file is a giant table, where the columns are commits and the rows are branches")
+	print("  The HTML file shows a giant grid, where the columns are commits and the rows are branches")
 	print("    of the repository pointed to via <path-to-git-repo>.")
 	print("  Since some repositories can have a large history, you can set the <maximum-number-of-commits-on-each-branch>")
 	print("    to only process that number of commits on any given branch.")
@@ -22,11 +32,48 @@ if len(sys.argv) < 3:
 	print("  You also may want to sort the branches by their last commit date, so you can see which branches are stale,")
 	print("    by adding 'sort-branches-by-date'.")
 	print("  Once the HTML file is being viewed, feel free to scroll around to see what branches have which commits.")
+	print("    Only the part of the grid in view is drawn, so even very large views open quickly. Click a branch to go to its latest commit.")
 	print("  Green commits mean that the commit is also in 'origin/production', blue for 'origin/staging', and red for 'origin/master',")
 	print("    with green overriding blue overriding red. Black means it is in none of these branches.")
 	print("  Green branches mean that every commit in that branch is also in 'origin/production', and similarly for blue and red branches.")
 	print("    If a branch has at least one commit in none of the special branches, then it is black.")
+	print("  You can choose different special branches by adding 'integration=' and a comma-separated list of them, highest first,")
+	print("    like 'integration=origin/release,origin/develop'. They are shown at the top, each followed by its local branch.")
 	print("  You may also hover over a commit id at the top to get details on the commit.")
+	print("  The commits read are cached in 'git-view-cache.sqlite' in the git directory of the repository, so that later runs only")
+	print("    read the new commits from git. You can turn this off with 'no-cache', or change how many commits are kept (the")
+	print("    least recently used are dropped first) with 'cache-size=' and a number.")
+	print("  Adding 'gzip' writes 'html/git-view-2.html.gz' instead, for serving large views compressed.")
+	print("  The details of each commit are written next to it in 'html/git-view-2-infos', and loaded only when hovered over.")
+	print("  The search box at the top right finds commits by words in their messages, their authors, tag names or the start of")
+	print("    their commit ids. Press enter to go to the next match.")
+	print("  Adding 'native' reads the refs and the commit-graph file of the repository directly instead of running git for them,")
+	print("    which is faster for large histories once 'git commit-graph write --reachable' has been run. Git is still run for the")
+	print("    commit messages and for commits that are not in the commit-graph yet.")
+	print("  Adding 'serve' keeps running and serves the view at http://localhost:8000/git-view-2.html, or another port with")
+	print("    'serve=' and a number. Whenever a branch moves, only the new commits are read, and open pages update themselves.")
+	print("  You can write the page somewhere else with 'output=' and a file name ending in '.html'. Its side files go next to it.")
+	print("  To view many repositories at once, see ./git-view-batch.py.")
+	print("  The remotes are fetched from first, all at once. Adding 'no-fetch' skips this, 'fetch-age=' and a number of seconds")
+	print("    skips it if the last fetch was more recent than that, and 'fetch-background' writes the page from what is already")
+	print("    there while fetching, and writes it again if the fetch moved any branches.")
+	print("  You can show only the commits made in a window of time with 'since=' and 'until=' and a date the way git takes it,")
+	print("    like 'since=2024-01-31' or 'since=2.weeks.ago'. Older history is not read at all, so a short window is quick.")
+	print("  Adding 'page-size=' and a number of columns writes only that many columns into the page, and the rest into pages in")
+	print("    'html/git-view-2-pages', which are loaded as the view is scrolled near the end of what is loaded. This is not done")
+	print("    with 'serve'.")
+	print("  Adding 'export=jsonl' writes which branches have which commits, with the level of each, to 'html/git-view-2-matrix.jsonl'")
+	print("    for other tools to read, and 'export=binary' writes the same to 'html/git-view-2-matrix.bin' with a bitmap per branch.")
+	print("    Both can be given as 'export=jsonl,binary'. See viewmatrix.py for the formats, and for reading them.")
+	print("  Adding 'ahead-behind' shows next to each branch how many commits it has that each integration branch does not, and")
+	print("    how many it is missing, like 'git rev-list --left-right --count'. Hover over a branch for the details. The commits")
+	print("    are counted over what was read, so with a small maximum number of commits, the oldest differences are left out.")
+	print("  You can sort the branches by how far they are ahead of or behind a branch, the most first, with")
+	print("    'sort-branches-by-ahead=' or 'sort-branches-by-behind=' and the branch, which also shows the counts.")
+	print("  The rows of large views are written by as many processes as there are cores, or the number given with")
+	print("    'render-workers=', on systems that can fork processes.")
+	print("  Adding 'stats' writes 'html/git-view-2-stats.json' next to the page, with the time taken by each phase, how often git")
+	print("    was run and how much it wrote, the peak memory used, the number of commits, branches and cells, and the output size.")
 	exit(0)
 
 # get params
@@ -38,320 +85,1325 @@ numCommits = int(sys.argv[2])
 
 noMerges = False
 sortBranchesByDate = False
+showAheadBehind = False
+sortAheadBehind = None # [0 for ahead or 1 for behind, the branch to count against]
+useCache = True
+useNative = False
+servePort = None
+fetchMode = 'wait' # or 'skip' or 'background'
+fetchMaxAge = None
+recordStats = False
+sinceText = None
+untilText = None
+since = None # the unix times of the window, from sinceText and untilText
+until = None
+pageSize = None
+exportFormats = []
+renderWorkers = os.cpu_count() or 1
+gzipOutput = False
+outputBufferSize = 1 << 20
+outputPath = 'html/git-view-2.html'
+cacheSize = commitcache.defaultMaxEntries
+integrationBranchNames = ['origin/production', 'origin/staging', 'origin/master'] # highest level first
 for arg in sys.argv:
 	if arg == 'no-merges':
 		noMerges = True
 	if arg == 'sort-branches-by-date':
 		sortBranchesByDate = True
+	if arg == 'ahead-behind':
+		showAheadBehind = True
+	if arg.startswith('sort-branches-by-ahead='):
+		sortAheadBehind = [0, arg[23:]]
+	if arg.startswith('sort-branches-by-behind='):
+		sortAheadBehind = [1, arg[24:]]
+	if arg.startswith('integration='):
+		integrationBranchNames = [branchName for branchName in arg[12:].split(',') if branchName != '']
+	if arg == 'no-cache':
+		useCache = False
+	if arg.startswith('cache-size='):
+		cacheSize = int(arg[11:])
+	if arg == 'gzip':
+		gzipOutput = True
+	if arg == 'native':
+		useNative = True
+	if arg == 'serve':
+		servePort = 8000
+	if arg.startswith('serve='):
+		servePort = int(arg[6:])
+	if arg.startswith('output=') and arg.endswith('.html'):
+		outputPath = arg[7:]
+	if arg == 'no-fetch':
+		fetchMode = 'skip'
+	if arg.startswith('fetch-age='):
+		fetchMaxAge = int(arg[10:])
+	if arg == 'fetch-background':
+		fetchMode = 'background'
+	if arg == 'stats':
+		recordStats = True
+	if arg.startswith('since='):
+		sinceText = arg[6:]
+	if arg.startswith('until='):
+		untilText = arg[6:]
+	if arg.startswith('page-size='):
+		pageSize = max(1, int(arg[10:]))
+	if arg.startswith('render-workers='):
+		renderWorkers = max(1, int(arg[15:]))
+	if arg.startswith('export='):
+		exportFormats = [exportFormat for exportFormat in arg[7:].split(',') if exportFormat in ['jsonl', 'binary']]
+# the branches that the others are counted ahead of and behind
+aheadBehindBranchNames = []
+if showAheadBehind or sortAheadBehind is not None:
+	aheadBehindBranchNames = integrationBranchNames + ([sortAheadBehind[1]] if sortAheadBehind is not None and sortAheadBehind[1] not in integrationBranchNames else [])
+if servePort is not None:
+	gzipOutput = False # the page is served as it is written
+	pageSize = None # the updates are for the whole view
 
-def callGit (args, failOnError = True):
-	pr = subprocess.Popen([gitPath] + args.split(' '), cwd=path, shell = False, stdout = subprocess.PIPE, stderr = subprocess.PIPE )
-	(out, error) = pr.communicate()
-	if len(error) != 0 and failOnError:
-		print('Error: ' + error.decode('UTF-8'))
-		return None
-	else:
-		return out.decode('UTF-8').split('\n')
+# the colors of the commits in each integration branch, from the lowest level up, and repeated if there are more branches
+levelColors = [['#ff0000', '#ffffff'], ['#3388ff', '#000000'], ['#00aa00', '#000000']]
 
-def newCommit (name):
-	commit = {}
-	commit['name'] = name
-	commit['date'] = 0
-	commit['author'] = ''
-	commit['desc'] = ''
-	commit['count'] = 0
-	return commit
+def levelColor (level):
+	if level == 0:
+		return ['#000000', '#ffffff']
+	return levelColors[(level - 1) % len(levelColors)]
 
 def newBranch (name):
 	branch = {}
 	branch['name'] = name
-	branch['commits'] = set()
-	branch['latestcommit'] = ''
+	branch['row'] = 0 # bit i is set when the branch has the commit in column i
+	branch['latestcommit'] = -1 # the index of the commit in the store
+	branch['head'] = ''
 	branch['display'] = name
 	branch['local'] = True
 	return branch
 
-# make sure we have all the infos
-callGit('fetch -p', False)
-
-# get branches
-branchLines = callGit('branch -a')
-branches = {}
-for branchLine in branchLines:
-	if len(branchLine) == 0:
-		continue
-	branchName = branchLine[2:]
-	if branchName.startswith('remotes/origin/HEAD'):
-		continue
-	if branchName.startswith('remotes/'):
-		branches[branchName[8:]] = newBranch(branchName[8:])
-		branches[branchName[8:]]['display'] = branchName[8:].partition('/')[2] + ' (' + branchName[8:].partition('/')[0] + ')'
-		branches[branchName[8:]]['local'] = False
-	else:
-		branches[branchName] = newBranch(branchName)
+def refBranchName (refName):
+	return (refName[13:] if refName.startswith('refs/remotes/') else refName[11:])
+
+# reads everything that the page shows from the repo into a view, taking the commits from the cache where it has them
+# with oldView, the view that the page shows now, its commits are taken from it instead, and its rows are kept where they can be
+def readView (path, cache, oldView = None):
+	view = {}
+	view['version'] = 0 # the number of live updates before this view, see serveView
 
-# get commits
-commits = {}
+	# get branches
+	runstats.phase('refs')
+	refs = gitlog.readRefs(path)
+	branches = {}
+	for (refName, commitName) in refs:
+		branchName = refBranchName(refName)
+		branches[branchName] = newBranch(branchName)
+		if refName.startswith('refs/remotes/'):
+			branches[branchName]['display'] = branchName.partition('/')[2] + ' (' + branchName.partition('/')[0] + ')'
+			branches[branchName]['local'] = False
+		branches[branchName]['head'] = commitName
+	view['refs'] = refs
+	view['branches'] = branches
 
-for branchName in branches:
-	branch = branches[branchName]
-	count = 0
-	lastCommitName = ''
-	if noMerges:
-		mergeOption = '--no-merges '
+	# get commits, walking the history of every branch at once, and reading from git only what is not cached
+	# merges are still walked when they are not wanted, since they connect the branches in the graph, but are not counted
+	runstats.phase('commits')
+	# with a window, the walk stops at its start, and the commits after its end are read only to connect the branches to it
+	movedForward = dict([(refBranchName(refName), head) for (refName, head) in commitcache.updateRefs(path, cache, refs, numCommits, since, until).items()])
+	store = commitstore.newStore()
+	heads = [branches[branchName]['head'] for branchName in branches]
+	if oldView is None:
+		commitstore.addRecords(store, commitcache.readCommits(path, cache, heads, numCommits, since, until, not noMerges))
 	else:
-		mergeOption = ''
-	logLines = callGit('log --date=raw ' + mergeOption + '-n ' + str(numCommits) + ' ' + ('heads/' if branch['local'] else 'remotes/') + branch['name'] + ' --')
-	skipCommit = False
-	if logLines is None:
-		continue # not a valid branch, so ignore it
-	for logLine in logLines:
-		logLine = logLine.strip(' \t')
-		if logLine is '':
-			continue
-		if logLine.startswith('commit '):
-			name = logLine[7:]
-			if name not in commits:
-				commit = newCommit(name)
-				commits[name] = commit
-				skipCommit = False
-			else:
-				skipCommit = True
-			lastCommitName = name
-			if branch['latestcommit'] == '':
-				branch['latestcommit'] = name
-			branch['commits'].add(name)
-		elif logLine.startswith('Date'):
-			if not skipCommit:
-				try:
-					commits[lastCommitName]['date'] = int(logLine[8:-6])
-				except ValueError:
-					continue
-		elif logLine.startswith('Author'):
-			if not skipCommit:
-				commits[lastCommitName]['author'] = logLine[8:].replace("<", r"&lt;").replace(">", r"&gt;")
+		# the same walk, over the commits of the old view where it has them, so that only the new ones are read from the cache
+		oldStore = oldView['store']
+		oldIndices = commitstore.commitIndices(oldStore)
+		def known (names):
+			found = {}
+			for name in names:
+				i = oldIndices.get(bytes.fromhex(name), -1)
+				if i >= 0:
+					found[name] = [[commitstore.name(oldStore, parent) for parent in commitstore.parents(oldStore, i)], commitstore.commitDate(oldStore, i)]
+			return found
+		order = commitcache.walkCommits(path, cache, heads, numCommits, since, until, not noMerges, known)
+		newRecords = dict([(record[0], record) for record in commitcache.loadRecords(cache, [name for name in order if bytes.fromhex(name) not in oldIndices])])
+		for name in order:
+			key = bytes.fromhex(name)
+			if key in oldIndices:
+				commitstore.copyCommit(store, oldStore, oldIndices[key])
+			elif name in newRecords:
+				commitstore.addRecords(store, [newRecords[name]])
+	commitstore.finishStore(store)
+	numStoreCommits = commitstore.count(store)
+	view['store'] = store
+
+	# the commits that were walked and are shown, so not the parents at the edge of the walk, nor merges if they are not wanted,
+	# nor the commits after the window
+	shown = bytearray(numStoreCommits)
+	for i in range(0, numStoreCommits):
+		shown[i] = not commitstore.isStub(store, i) and not (noMerges and commitstore.numParents(store, i) > 1) and not (until is not None and commitstore.commitDate(store, i) > until)
+
+	# label each commit with the integration branches that have it, and keep the highest as its level
+	# levels holds the highest integration branch that has each commit, 0 for none
+	runstats.phase('levels')
+	integrationHeads = [(commitstore.find(store, branches[branchName]['head']) if branchName in branches else -1) for branchName in integrationBranchNames]
+	labels = commitstore.labelAncestors(store, integrationHeads)
+	levels = bytearray(numStoreCommits)
+	for i in range(0, numStoreCommits):
+		for b in range(0, len(integrationBranchNames)):
+			if labels[i] & (1 << b):
+				levels[i] = len(integrationBranchNames) - b
+				break
+
+	for branchName in branches:
+		latestCommit = commitstore.find(store, branches[branchName]['head'])
+		while noMerges and latestCommit >= 0 and not commitstore.isStub(store, latestCommit) and commitstore.numParents(store, latestCommit) > 1:
+			latestCommit = commitstore.parents(store, latestCommit)[0]
+		if latestCommit >= 0 and not commitstore.isStub(store, latestCommit):
+			branches[branchName]['latestcommit'] = latestCommit
+
+	# count how far each branch is ahead of and behind each of aheadBehindBranchNames, all in one pass over the graph
+	if len(aheadBehindBranchNames) > 0:
+		runstats.phase('aheadBehind')
+		branchOrder = list(branches)
+		counts = commitstore.aheadBehind(store, [commitstore.find(store, branches[branchName]['head']) for branchName in branchOrder], [(commitstore.find(store, branches[branchName]['head']) if branchName in branches else -1) for branchName in aheadBehindBranchNames])
+		for b in range(0, len(branchOrder)):
+			branches[branchOrder[b]]['aheadBehind'] = counts[b] # [ahead, behind] or None for each of aheadBehindBranchNames
+
+	# get tags that point to shown commits, as [name, the index of the commit, the tagger date or None]
+	runstats.phase('tags')
+	tags = []
+	for (tag, commitName, taggerDate) in gitlog.readTags(path):
+		commit = commitstore.find(store, commitName)
+		if commit >= 0 and shown[commit]:
+			tags.append([tag, commit, taggerDate])
+
+	# the columns are the shown commits and the tags, newest first, where a tag column goes with the commit it points to
+	# columnCommits holds the commit of each column, and columnTags the tag of each tag column
+	# a tag column is dated just after its commit so that it sorts next to it
+	view['columnCommits'] = array.array('l', [i for i in range(0, numStoreCommits) if shown[i]] + [commit for (tag, commit, taggerDate) in tags])
+	view['columnTags'] = dict([(len(view['columnCommits']) - len(tags) + t, tags[t][0]) for t in range(0, len(tags))])
+	view['tagDates'] = dict([(tag, taggerDate) for (tag, commit, taggerDate) in tags if taggerDate is not None])
+
+	# get sorted by dates, keeping the newest columns
+	runstats.phase('columns')
+	# commits made in the same second are ordered by name, so that the order does not depend on how they were read
+	columnOrder = sorted(range(0, len(view['columnCommits'])), key = lambda c : (columnDate(view, c), commitstore.commitDate(store, view['columnCommits'][c]), commitstore.name(store, view['columnCommits'][c]), view['columnTags'].get(c, '')))
+	columnOrder.reverse()
+	columnOrder = columnOrder[:numCommits]
+	view['columnTags'] = dict([(c, view['columnTags'][columnOrder[c]]) for c in range(0, len(columnOrder)) if columnOrder[c] in view['columnTags']])
+	view['columnCommits'] = array.array('l', [view['columnCommits'][i] for i in columnOrder])
+	columnCommits = view['columnCommits']
+	columnTags = view['columnTags']
+	numColumns = len(columnCommits)
+	view['numColumns'] = numColumns
+
+	# the column of each commit that is still shown, or -1
+	commitColumns = array.array('l', [-1]) * numStoreCommits
+	for c in range(0, numColumns):
+		if c not in columnTags:
+			commitColumns[columnCommits[c]] = c
+	view['commitColumns'] = commitColumns
+
+	# give each column a bit, and keep the level of each column
+	columnBits = {}
+	columnLevels = bytearray(numColumns)
+	for c in range(0, numColumns):
+		commit = columnCommits[c]
+		if commitColumns[commit] >= 0:
+			columnBits[commit] = (columnBits[commit] | (1 << c) if commit in columnBits else 1 << c)
+			columnLevels[c] = levels[commit]
+	view['columnLevels'] = columnLevels
+	# the columns of each level as a row of bits, read in one go from a digit per column, the last column first
+	# the columns without a bit are in the row of level 0, which no branch has any of
+	levelColumns = [int(columnLevels.translate(bytes([(49 if i == level else 48) for i in range(0, 256)]))[::-1] or b'0', 2) for level in range(0, len(integrationBranchNames) + 1)]
+
+	# work out the columns in each branch from the commit graph as a row of bits, and the lowest level that the row reaches
+	runstats.phase('rows')
+	rows = (keptRows(view, oldView, oldIndices, columnBits, movedForward) if oldView is not None else None)
+	if rows is None:
+		columnsReached = commitstore.reachableBits(store, columnBits)
+	for branchName in branches:
+		branch = branches[branchName]
+		if rows is not None:
+			branch['row'] = rows[branchName]
 		else:
-			if not skipCommit:
-				if len(commits[lastCommitName]['desc']) > 0:
-					commits[lastCommitName]['desc'] += '<br />'
-				commits[lastCommitName]['desc'] += logLine.replace("&", r"&amp;").replace("<", r"&lt;").replace(">", r"&gt;")
-
-# get tags
-tags = callGit('tag')
-for tag in tags:
-	if tag is '':
-		continue
-	lines = callGit('show ' + tag)
-	if lines is not None:
-		for line in lines:
-			if line.startswith('commit'):
-				commitName = line[7:]
-				if commitName not in commits:
+			headCommit = commitstore.find(store, branch['head'])
+			branch['row'] = (columnsReached[headCommit] if headCommit >= 0 else 0)
+		branch['level'] = len(integrationBranchNames)
+		for level in range(0, len(integrationBranchNames)):
+			if branch['row'] & levelColumns[level]:
+				branch['level'] = level
+				break
+
+	# sort branch names
+	if sortAheadBehind is not None:
+		t = aheadBehindBranchNames.index(sortAheadBehind[1])
+		branchNames = sorted(branches, key = lambda branchName : (-branches[branchName]['aheadBehind'][t][sortAheadBehind[0]] if branches[branchName]['aheadBehind'][t] is not None else 0, branches[branchName]['display']))
+	elif sortBranchesByDate:
+		branchNames = sorted(branches, key = lambda branchName : (commitstore.date(store, branches[branchName]['latestcommit']) if branches[branchName]['latestcommit'] >= 0 and commitColumns[branches[branchName]['latestcommit']] >= 0 else 0))
+	else:
+		branchNames = sorted(branches, key = lambda branchName : branches[branchName]['display'])
+
+	# the integration branches go at the top, each followed by its local branch
+	topBranchNames = []
+	for branchName in integrationBranchNames:
+		for name in [branchName, (branchName.partition('/')[2] if branchName in branches and not branches[branchName]['local'] else '')]:
+			if name in branches and name not in topBranchNames:
+				topBranchNames.append(name)
+	view['rowBranchNames'] = topBranchNames + [branchName for branchName in branchNames if branchName not in topBranchNames]
+
+	# the details of the commits go in side files, keyed by the start of the commit name, or 'tags' for the tag columns
+	view['infoPrefixLength'] = (2 if numColumns < 256 * 256 else 3)
+	return view
+
+# the rows of the branches worked out from those of oldView, when its columns are all still there after the added ones and the walk
+# only lost commits at its edge that lead to no column: the branches that did not move keep their rows, shifted by the added columns,
+# and the branches that moved forward add the columns that they reach without going through their old heads
+# returns None when that is not so, or a branch is new or was moved back or aside, so that the rows are worked out from the whole graph
+def keptRows (view, oldView, oldIndices, columnBits, movedForward):
+	added = addedColumns(oldView, view)
+	if added < 0:
+		return None
+	store = view['store']
+	oldStore = oldView['store']
+	columnCommits = view['columnCommits']
+	commitColumns = view['commitColumns']
+	oldColumnCommits = oldView['columnCommits']
+	for c in view['columnTags']:
+		if c >= added and commitstore.name(store, columnCommits[c]) != commitstore.name(oldStore, oldColumnCommits[c - added]):
+			return None # a tag that was moved
+	indices = commitstore.commitIndices(store)
+	# with no parent newer than its child, the commits walked now that were not before are newer than all of those, so the old
+	# heads cannot reach them, and they have all of the added columns
+	for i in indices.values():
+		for parent in commitstore.parents(store, i):
+			if not commitstore.isStub(store, parent) and commitstore.commitDate(store, parent) > commitstore.commitDate(store, i):
+				return None
+	oldestDate = min([commitstore.commitDate(oldStore, i) for i in oldIndices.values()], default = 0)
+	newCommits = set([i for (key, i) in indices.items() if key not in oldIndices])
+	if any([commitstore.commitDate(store, i) <= oldestDate for i in newCommits]) or any([columnCommits[c] not in newCommits for c in range(0, added)]):
+		return None
+	# the old rows may have columns that were reached through the commits that are no longer walked
+	nameLength = oldStore['nameLength']
+	stack = [i for (key, i) in oldIndices.items() if key not in indices]
+	seen = set(stack)
+	while len(stack) > 0:
+		i = stack.pop()
+		key = bytes(oldStore['names'][i * nameLength:(i + 1) * nameLength])
+		if key in indices and commitColumns[indices[key]] >= 0:
+			return None
+		for parent in commitstore.parents(oldStore, i):
+			if parent not in seen and not commitstore.isStub(oldStore, parent):
+				seen.add(parent)
+				stack.append(parent)
+	mask = (1 << view['numColumns']) - 1
+	rows = {}
+	for branchName in view['branches']:
+		branch = view['branches'][branchName]
+		oldBranch = oldView['branches'].get(branchName)
+		if oldBranch is None:
+			return None
+		oldRow = (oldBranch['row'] << added) & mask
+		row = oldRow
+		if branch['head'] != oldBranch['head']:
+			headCommit = commitstore.find(store, branch['head'])
+			if movedForward.get(branchName) != oldBranch['head'] or headCommit < 0:
+				return None
+			oldHead = commitstore.find(store, oldBranch['head'])
+			stack = [headCommit]
+			seen = set()
+			while len(stack) > 0:
+				i = stack.pop()
+				if i in seen or i == oldHead:
 					continue
-				commit = newCommit(tag)
-				commit['date'] = commits[commitName]['date'] + 1
-				commit['desc'] = 'TAG to ' + commitName
-				commits[tag] = commit	
-
-# get sorted by dates
-commitsByDate = sorted(commits.values(), key = lambda commit : commit['date'])
-commitsByDate.reverse()
-count = 0
-for commit in commitsByDate:
-	commit['count'] = count
-	count = count + 1
-
-# filter out branches by count
-for commit in commitsByDate:
-	if commit['count'] >= numCommits:
-		for branchName in branches:
-			branch = branches[branchName]
-			if commit['name'] in branch['commits']:
-				branch['commits'].remove(commit['name'])
-		del commits[commit['name']]
-commitsByDate = commitsByDate[:numCommits]
-
-# sort branch names
-if sortBranchesByDate:
-	branchNames = sorted(branches, key = lambda branchName : (commits[branches[branchName]['latestcommit']]['date'] if branches[branchName]['latestcommit'] in commits else 0))
-else:
-	branchNames = sorted(branches, key = lambda branchName : branches[branchName]['display'])
+				seen.add(i)
+				if commitColumns[i] >= 0 and (oldRow >> commitColumns[i]) & 1:
+					continue # the old head reaches it, and so all that it reaches
+				row |= columnBits.get(i, 0)
+				stack.extend(commitstore.parents(store, i))
+		rows[branchName] = row
+	return rows
+
+def columnDate (view, c):
+	return commitstore.date(view['store'], view['columnCommits'][c]) + (1 if c in view['columnTags'] else 0)
+
+def levelOfColumn (view, i):
+	return view['columnLevels'][i]
+
+# the levels of the columns from start to end as the digits that the page uses
+def levelDigits (view, start, end):
+	return ''.join([chr(48 + level) for level in view['columnLevels'][start:end]])
 
 # print html
-f = open('html/git-view-2.html', 'w')
-print('''<html>
+# the page holds the grid as compact data, a run-length encoded row per branch, and draws only the part in view on a canvas
+# it is made by generators that yield it a row at a time, streamed into a buffered and optionally gzipped file
+
+# the rows are rendered by rowrender, in worker processes for large views
+scriptJson = rowrender.scriptJson
+
+def columnName (view, c):
+	if c in view['columnTags']:
+		return view['columnTags'][c]
+	return commitstore.name(view['store'], view['columnCommits'][c])
+
+def columnKind (view, c):
+	if c in view['columnTags']:
+		return 't'
+	elif commitstore.numParents(view['store'], view['columnCommits'][c]) > 1:
+		return 'm'
+	else:
+		return 'c'
+
+# the date shown in the details, which for annotated tags is when they were tagged
+def columnInfoDate (view, c):
+	if c in view['columnTags'] and view['columnTags'][c] in view['tagDates']:
+		return view['tagDates'][view['columnTags'][c]]
+	return columnDate(view, c)
+
+def columnAuthor (view, c):
+	if c in view['columnTags']:
+		return ''
+	return commitstore.author(view['store'], view['columnCommits'][c]).replace("<", r"&lt;").replace(">", r"&gt;")
+
+# the message of the commit, or what the tag points to, as html
+def columnDesc (view, c):
+	store = view['store']
+	commit = view['columnCommits'][c]
+	if c in view['columnTags']:
+		return 'TAG to ' + commitstore.name(store, commit)
+	descLines = []
+	if commitstore.numParents(store, commit) > 1:
+		descLines.append('Merge: ' + ' '.join([commitstore.name(store, parent)[:7] for parent in commitstore.parents(store, commit)]))
+	for line in commitstore.message(store, commit).split('\n'):
+		line = line.strip(' \t')
+		if line != '':
+			descLines.append(line.replace("&", r"&amp;").replace("<", r"&lt;").replace(">", r"&gt;"))
+	return '<br />'.join(descLines)
+
+# the [display, level, column of the latest commit or -1, runs] of a branch's row, and then its ahead and behind counts if there are any
+def rowData (view, branchName):
+	branch = view['branches'][branchName]
+	latestCount = (view['commitColumns'][branch['latestcommit']] if branch['latestcommit'] >= 0 else -1)
+	return [branch['display'], branch['level'], latestCount, rowrender.bitRuns(branch['row'], view['numColumns'])] + ([branch['aheadBehind']] if 'aheadBehind' in branch else [])
+
+def pageHead ():
+	yield '''<html>
 <style>
-td { height: 24px; overflow: hidden; white-space: nowrap; }
-td.branches { text-align: left; overflow: hidden; white-space: nowrap; }
-td.branches div { width: 251px; margin-left: 5px; }
-#cells td, #commits td { text-align: center; min-width: 48px; max-width: 48px; height: 24px; overflow: hidden; }
-.white { background-color: white; }
-.grey { background-color: #ddddff; }
-.notmerged { background-color: #000000; color: #ffffff; }
-.master { background-color: #ff0000; color: #ffffff; }
-.staging { background-color: #3388ff; }
-.production { background-color: #00aa00; }
+body { margin: 0px; overflow: hidden; }
+#info { position: absolute; z-index: 3; left: 0px; top: 0px; right: 0px; height: 96px; background: white; overflow: hidden; }
+#grid { position: absolute; z-index: 1; left: 0px; top: 96px; }
+#view { position: absolute; z-index: 2; left: 0px; top: 96px; right: 0px; bottom: 0px; overflow: auto; }
 </style><body>
-''', file = f)
-
-# info area
-print('<div id="info" style="position: absolute; z-index: 3; background: white; overflow: hidden; height: 96px;"></div>', file = f )
-
-# print first row
-print('<table id="commits" style="table-layout: fixed; background-color: white; position: absolute; z-index: 2; table-layout: fixed; border: 0px solid black; left: 256px; top: 96px; height: 24px;" cellpadding=0 cellspacing=0><tr>', file = f)
-for i in range(0, len(commitsByDate)):
-	commit = commitsByDate[i]
-	background = ''
-	if commit['desc'].startswith('TAG'):
-		commitName = commit['name']
-		background = 'yellow';
-	elif commit['desc'].startswith('Merge'):
-		commitName = commit['name'][:5]
-		background = 'orange';
-	else:
-		commitName = commit['name'][:5]
-		background = 'white';
-	print('''<td onmouseover="document.getElementById('info').innerHTML = infos[\'''' + commit['name'] + '''\'];" style="background: ''' + background + ''';">''' + commitName + '</td>', file = f)
-print('</tr></table>', file = f)
-
-# print first col
-def printBranchLabel(branchName):
-	global branches
-	if branchName in branches:
-		color = '#ffffff';
-		text_color = '#000000'
-		if branches[branchName]['level'] == 0:
-			color = '#000000'
-			text_color = '#ffffff'
-		elif branches[branchName]['level'] == 1:
-			color = '#ff0000'
-			text_color = '#ffffff'
-		elif branches[branchName]['level'] == 2:
-			color = '#3388ff'
-		elif branches[branchName]['level'] == 3:
-			color = '#00aa00'
-		if branches[branchName]['latestcommit'] in commits:
-			print('<tr><td class="branches" style="background-color: ' + color + '; color: ' + text_color + ';"><div onclick="moveTo(' + str(commits[branches[branchName]['latestcommit']]['count']) + ');">' + branches[branchName]['display'] + '</div></td></tr>', file = f)
-		else:
-			print('<tr><td class="branches" style="background-color: ' + color + '; color: ' + text_color + ';"><div>' + branches[branchName]['display'] + '</div></td></tr>', file = f)
-
-# print graph
-print('<table id="cells" style="position: absolute; table-layout: fixed; border: 0px solid black; left: 256px; top: 120px;" cellpadding=0 cellspacing=0>', file = f)
-
-evenRow = True
-def printBranch(branch):
-	global evenRow
-	evenCol = True
-	branch['level'] = 3
-	commits_html = ''
-	for i in range(0, len(commitsByDate)):
-		commit = commitsByDate[i]
-		className = ''
-		text = ''
-		if commit['desc'].startswith("TAG to "):
-			name = commit['desc'][7:]
-		else:
-			name = commit['name']
-		if name in branch['commits']:
-			if 'origin/production' in branches and name in branches['origin/production']['commits']:
-				className = 'production'
-				branch['level'] = min(branch['level'], 3)
-			elif 'origin/staging' in branches and name in branches['origin/staging']['commits']:
-				className = 'staging'
-				branch['level'] = min(branch['level'], 2)
-			elif 'origin/master' in branches and name in branches['origin/master']['commits']:
-				className = 'master'
-				branch['level'] = min(branch['level'], 1)
-			else:
-				className = 'notmerged'
-				branch['level'] = min(branch['level'], 0)
-		else:
-			if evenCol or evenRow:
-				className = 'grey'
-			else:
-				className = 'white'
-		commits_html += '''<td class="''' + className + '''">''' + text + '''</td>\n'''
-		evenCol = not evenCol
-	print('<tr>' + commits_html + '</tr>', file = f)
-	evenRow = not evenRow
-
-if 'origin/production' in branches:
-	printBranch(branches['origin/production'])
-if 'production' in branches:
-	printBranch(branches['production'])
-if 'origin/staging' in branches:
-	printBranch(branches['origin/staging'])
-if 'staging' in branches:
-	printBranch(branches['staging'])
-if 'origin/master' in branches:
-	printBranch(branches['origin/master'])
-if 'master' in branches:
-	printBranch(branches['master'])
-for branchName in branchNames:
-	if branchName in ['origin/production', 'production', 'origin/staging', 'staging', 'origin/master', 'master']:
-		continue;
-	printBranch(branches[branchName])
-
-print('</table>', file = f)
-
-print('<table id="branches" style="table-layout: fixed; background-color: white; overflow: hidden; white-space: nowrap; position: absolute; z-index: 2; left: 0px; top: 120px; width: 256px;" cellpadding=0 cellspacing=0>', file = f)
-printBranchLabel('origin/production')
-printBranchLabel('production')
-printBranchLabel('origin/staging')
-printBranchLabel('staging')
-printBranchLabel('origin/master')
-printBranchLabel('master')
-for branchName in branchNames:
-	if branchName in ['origin/production', 'production', 'origin/staging', 'staging', 'origin/master', 'master']:
-		continue;
-	printBranchLabel(branchName)
-print('</table>', file = f)
-
-print('''
-<script language="javascript">
-var targetX = 0;
-var sliding = false;
-function update()
+<div id="info"></div>
+<input id="search" placeholder="search" style="position: absolute; z-index: 4; right: 24px; top: 8px; width: 240px;">
+<div id="searchStatus" style="position: absolute; z-index: 4; right: 24px; top: 36px;"></div>
+<canvas id="grid"></canvas>
+<div id="view"><div id="space"></div></div>
+'''
+
+def pageData (view):
+	numColumns = view['numColumns']
+	if pageSize is not None:
+		numColumns = min(numColumns, pageSize) # the first page, and the rest are in the pages directory
+	yield '<script>\n'
+	yield 'var columns = ' + scriptJson([columnName(view, c) for c in range(0, numColumns)]) + ';\n'
+	yield 'var columnKinds = ' + scriptJson(''.join([columnKind(view, c) for c in range(0, numColumns)])) + ';\n'
+	yield 'var columnLevels = ' + scriptJson(levelDigits(view, 0, numColumns)) + ';\n'
+	yield 'var aheadBehindBranches = ' + scriptJson(aheadBehindBranchNames) + ';\n'
+	yield 'var levelColors = ' + scriptJson([levelColor(level) for level in range(0, len(integrationBranchNames) + 1)]) + ';\n'
+	yield 'var rows = [\n' # [display, level, column of the latest commit or -1, runs]
+	rows = []
+	for branchName in view['rowBranchNames']:
+		branch = view['branches'][branchName]
+		latestCount = (view['commitColumns'][branch['latestcommit']] if branch['latestcommit'] >= 0 else -1)
+		rows.append([branch['display'], branch['level'], latestCount, branch['row'] & ((1 << numColumns) - 1), numColumns] + ([branch['aheadBehind']] if 'aheadBehind' in branch else []))
+	yield from rowrender.renderRows(rows, renderWorkers)
+	yield '];\n'
+	yield 'var infoDirectory = ' + scriptJson(os.path.basename(infoDirectory)) + ';\n'
+	yield 'var infoPrefixLength = ' + str(view['infoPrefixLength']) + ';\n'
+	yield 'var searchFile = ' + scriptJson(os.path.basename(searchPath)) + ';\n'
+	yield 'var liveUpdates = ' + ('true' if servePort is not None else 'false') + ';\n'
+	yield 'var viewVersion = ' + str(view['version']) + ';\n' # bumped by each live update, so that the side files are loaded again
+	yield 'var pageSize = ' + str(pageSize if pageSize is not None else 0) + ';\n'
+	yield 'var pagesDirectory = ' + scriptJson(os.path.basename(pagesDirectory)) + ';\n'
+	yield '</script>\n'
+
+def pageScript ():
+	yield '''<script>
+var columnWidth = 48;
+var rowHeight = 24;
+var aheadBehindWidth = 72; // for the counts against each of aheadBehindBranches, at the right of the labels
+var labelWidth = 256 + aheadBehindBranches.length * aheadBehindWidth;
+var columnBackgrounds = { t: 'yellow', m: 'orange', c: 'white' };
+var info = document.getElementById('info');
+var view = document.getElementById('view');
+var canvas = document.getElementById('grid');
+var context = canvas.getContext('2d');
+var rowBounds = [];
+var drawPending = false;
+
+document.getElementById('space').style.width = (labelWidth + columns.length * columnWidth) + 'px';
+document.getElementById('space').style.height = (rowHeight + rows.length * rowHeight) + 'px';
+
+// the columns where each run of the row ends, decoded when the row first comes into view
+function bounds(r)
+{
+	if(rowBounds[r] === undefined)
+	{
+		var runs = rows[r][3];
+		var b = new Int32Array(runs.length);
+		var end = 0;
+		for(var i = 0; i < runs.length; i++)
+		{
+			end += runs[i];
+			b[i] = end;
+		}
+		rowBounds[r] = b;
+	}
+	return rowBounds[r];
+}
+
+// the index of the first run with commits that ends after the column
+function firstRun(b, column)
+{
+	var low = 0;
+	var high = b.length / 2;
+	while(low < high)
+	{
+		var mid = (low + high) >> 1;
+		if(b[mid * 2 + 1] <= column)
+			low = mid + 1;
+		else
+			high = mid;
+	}
+	return low * 2;
+}
+
+function draw()
 {
-	if(sliding)
+	drawPending = false;
+	var width = view.clientWidth;
+	var height = view.clientHeight;
+	var ratio = window.devicePixelRatio || 1;
+	if(canvas.width != Math.floor(width * ratio) || canvas.height != Math.floor(height * ratio))
+	{
+		canvas.width = Math.floor(width * ratio);
+		canvas.height = Math.floor(height * ratio);
+		canvas.style.width = width + 'px';
+		canvas.style.height = height + 'px';
+	}
+	context.setTransform(ratio, 0, 0, ratio, 0, 0);
+	context.textBaseline = 'middle';
+	context.font = '16px serif';
+	var left = view.scrollLeft;
+	var top = view.scrollTop;
+	var firstColumn = Math.floor(left / columnWidth);
+	var endColumn = Math.min(columns.length, Math.ceil((left + width - labelWidth) / columnWidth));
+	var firstRow = Math.floor(top / rowHeight);
+	var endRow = Math.min(rows.length, Math.ceil((top + height - rowHeight) / rowHeight));
+	context.fillStyle = 'white';
+	context.fillRect(0, 0, width, height);
+
+	// cells
+	for(var r = firstRow; r < endRow; r++)
 	{
-		var offset = Math.floor((targetX - window.pageXOffset) / 2);
-		if(Math.abs(offset) < 2)
+		var y = rowHeight + r * rowHeight - top;
+		for(var c = firstColumn; c < endColumn; c++)
 		{
-			offset = targetX - window.pageXOffset;
-			sliding = false;
+			context.fillStyle = (c % 2 == 0 || r % 2 == 0) ? '#ddddff' : 'white';
+			context.fillRect(labelWidth + c * columnWidth - left, y, columnWidth, rowHeight);
 		}
-		window.scrollTo(window.pageXOffset + offset, window.pageYOffset);
+		var b = bounds(r);
+		for(var i = firstRun(b, firstColumn); i < b.length && b[i] < endColumn; i += 2)
+		{
+			for(var c = Math.max(b[i], firstColumn); c < Math.min(b[i + 1], endColumn); c++)
+			{
+				context.fillStyle = levelColors[columnLevels.charCodeAt(c) - 48][0];
+				context.fillRect(labelWidth + c * columnWidth - left, y, columnWidth, rowHeight);
+			}
+		}
+	}
+
+	// first row
+	context.textAlign = 'center';
+	for(var c = firstColumn; c < endColumn; c++)
+	{
+		var x = labelWidth + c * columnWidth - left;
+		context.fillStyle = columnBackgrounds[columnKinds[c]];
+		context.fillRect(x, 0, columnWidth, rowHeight);
+		context.save();
+		context.beginPath();
+		context.rect(x, 0, columnWidth, rowHeight);
+		context.clip();
+		context.fillStyle = 'black';
+		context.fillText(columnKinds[c] == 't' ? columns[c] : columns[c].substr(0, 5), x + columnWidth / 2, rowHeight / 2);
+		context.restore();
+	}
+	if(searchColumn >= firstColumn && searchColumn < endColumn)
+	{
+		context.strokeStyle = 'magenta';
+		context.lineWidth = 3;
+		context.strokeRect(labelWidth + searchColumn * columnWidth - left + 1.5, 1.5, columnWidth - 3, height - 3);
+	}
+
+	// first col
+	context.textAlign = 'left';
+	context.save();
+	context.beginPath();
+	context.rect(0, rowHeight, labelWidth - 5, height);
+	context.clip();
+	for(var r = firstRow; r < endRow; r++)
+	{
+		var y = rowHeight + r * rowHeight - top;
+		var colors = levelColors[rows[r][1]];
+		context.fillStyle = colors[0];
+		context.fillRect(0, y, labelWidth, rowHeight);
+		context.fillStyle = colors[1];
+		context.fillText(rows[r][0], 5, y + rowHeight / 2);
+		if(rows[r].length > 4)
+		{
+			var countsLeft = labelWidth - aheadBehindBranches.length * aheadBehindWidth - 5;
+			context.fillStyle = colors[0];
+			context.fillRect(countsLeft, y, labelWidth - countsLeft, rowHeight);
+			context.fillStyle = colors[1];
+			context.font = '12px sans-serif';
+			context.textAlign = 'right';
+			for(var t = 0; t < aheadBehindBranches.length; t++)
+			{
+				var counts = rows[r][4][t];
+				context.fillText(counts === null ? '-' : '+' + counts[0] + ' -' + counts[1], countsLeft + (t + 1) * aheadBehindWidth, y + rowHeight / 2);
+			}
+			context.font = '16px serif';
+			context.textAlign = 'left';
+		}
+	}
+	context.restore();
+	context.fillStyle = 'white';
+	context.fillRect(0, 0, labelWidth, rowHeight);
+	if(aheadBehindBranches.length > 0)
+	{
+		var countsLeft = labelWidth - aheadBehindBranches.length * aheadBehindWidth - 5;
+		context.fillStyle = 'black';
+		context.font = '12px sans-serif';
+		context.textAlign = 'right';
+		for(var t = 0; t < aheadBehindBranches.length; t++)
+			context.fillText(aheadBehindBranches[t].split('/').pop(), countsLeft + (t + 1) * aheadBehindWidth, rowHeight / 2);
+		context.font = '16px serif';
+		context.textAlign = 'left';
+	}
+	if(pageIndex !== null && columns.length < pageIndex.numColumns)
+	{
+		context.fillStyle = 'black';
+		context.fillText(columns.length + ' of ' + pageIndex.numColumns + ' columns', 5, rowHeight / 2);
+	}
+	loadPages();
+}
+
+function requestDraw()
+{
+	if(!drawPending)
+	{
+		drawPending = true;
+		window.requestAnimationFrame(draw);
+	}
+}
+
+// the details of the commits are loaded a shard at a time when first hovered over, and the recently used shards are kept
+var infoShards = new Map();
+var infoShardCallbacks = {};
+var maxInfoShards = 16;
+var hoveredColumn = -1;
+
+function infoShardLoaded(key, infos)
+{
+	infoShards.set(key, infos);
+	while(infoShards.size > maxInfoShards)
+		infoShards.delete(infoShards.keys().next().value);
+	var callbacks = infoShardCallbacks[key] || [];
+	delete infoShardCallbacks[key];
+	for(var i = 0; i < callbacks.length; i++)
+		callbacks[i](infos);
+}
+
+function withInfos(key, callback)
+{
+	if(infoShards.has(key))
+	{
+		var infos = infoShards.get(key);
+		infoShards.delete(key);
+		infoShards.set(key, infos);
+		callback(infos);
+		return;
 	}
+	if(infoShardCallbacks[key] !== undefined)
+	{
+		infoShardCallbacks[key].push(callback);
+		return;
+	}
+	infoShardCallbacks[key] = [callback];
+	var script = document.createElement('script');
+	script.src = infoDirectory + '/' + key + '.js' + (viewVersion > 0 ? '?v=' + viewVersion : '');
+	script.onload = function() { script.remove(); };
+	document.head.appendChild(script);
+}
 
-	setTimeout('update()', 30)
+function showInfo(c)
+{
+	if(c == hoveredColumn)
+		return;
+	hoveredColumn = c;
+	withInfos(columnKinds[c] == 't' ? 'tags' : columns[c].substr(0, infoPrefixLength), function(infos) {
+		if(hoveredColumn == c)
+			info.innerHTML = infos[columns[c]];
+	});
 }
+
+// with a page size, the columns past the first page are loaded a page at a time, in order, as the view nears the end of them
+// the index of the pages is loaded first, when the end of the first page is near
+var pageIndex = null;
+var pageLoading = false;
+var columnCallbacks = []; // [column, callback] for the columns wanted before they were loaded
+
+function pageIndexLoaded(index)
+{
+	pageIndex = index;
+	pageLoading = false;
+	loadPages();
+}
+
+// adds runs that start at the column start to the runs of a row, which end at or before it
+function appendRuns(runs, pageRuns, start)
+{
+	if(pageRuns.length == 0)
+		return runs;
+	var end = 0;
+	for(var i = 0; i < runs.length; i++)
+		end += runs[i];
+	runs = runs.slice();
+	if(runs.length > 0 && end == start && pageRuns[0] == 0)
+		runs[runs.length - 1] += pageRuns[1];
+	else
+		runs.push(start - end + pageRuns[0], pageRuns[1]);
+	return runs.concat(pageRuns.slice(2));
+}
+
+function pageLoaded(p, page)
+{
+	var start = pageIndex.pages[p][0];
+	if(columns.length != start)
+		return;
+	columns = columns.concat(page.columns);
+	columnKinds += page.columnKinds;
+	columnLevels += page.columnLevels;
+	for(var r = 0; r < rows.length; r++)
+		rows[r][3] = appendRuns(rows[r][3], page.runs[r], start);
+	rowBounds = [];
+	document.getElementById('space').style.width = (labelWidth + columns.length * columnWidth) + 'px';
+	pageLoading = false;
+	loadPages();
+	requestDraw();
+}
+
+function loadPages()
+{
+	if(pageSize == 0 || pageLoading)
+		return;
+	var wanted = Math.ceil((view.scrollLeft + 2 * view.clientWidth) / columnWidth);
+	for(var i = 0; i < columnCallbacks.length; i++)
+		wanted = Math.max(wanted, columnCallbacks[i][0] + 1);
+	var p = Math.ceil(columns.length / pageSize);
+	if(pageIndex !== null)
+	{
+		var callbacks = columnCallbacks.filter(function(columnCallback) { return columnCallback[0] < columns.length || p >= pageIndex.pages.length; });
+		columnCallbacks = columnCallbacks.filter(function(columnCallback) { return callbacks.indexOf(columnCallback) == -1; });
+		for(var i = 0; i < callbacks.length; i++)
+			if(callbacks[i][0] < columns.length)
+				callbacks[i][1]();
+		if(p >= pageIndex.pages.length)
+			return;
+	}
+	if(wanted <= columns.length)
+		return;
+	pageLoading = true;
+	var script = document.createElement('script');
+	script.src = pagesDirectory + '/' + (pageIndex === null ? 'index' : p) + '.js';
+	script.onload = function() { script.remove(); };
+	document.head.appendChild(script);
+}
+
+// calls back once the column is loaded, loading the pages up to it if needed
+function withColumn(c, callback)
+{
+	if(c < columns.length)
+	{
+		callback();
+		return;
+	}
+	columnCallbacks.push([c, callback]);
+	loadPages();
+}
+
+// the counts of the row, in words, in place of the details of a commit
+function showAheadBehind(r)
+{
+	hoveredColumn = -1;
+	var lines = [];
+	for(var t = 0; t < aheadBehindBranches.length; t++)
+	{
+		var counts = rows[r][4][t];
+		if(counts !== null)
+			lines.push(counts[0] + ' ahead of and ' + counts[1] + ' behind ' + aheadBehindBranches[t]);
+	}
+	info.innerHTML = rows[r][0].replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;') + '<br />' + lines.join('<br />');
+}
+
+// the search index is loaded when the search box is first used, and decompressed by the browser
+var searchIndex = null;
+var searchLoading = false;
+var searchQuery = '';
+var searchResults = [];
+var searchPosition = 0;
+var searchColumn = -1;
+var searchBox = document.getElementById('search');
+var searchStatus = document.getElementById('searchStatus');
+
+function searchIndexLoaded(data)
+{
+	var bytes = Uint8Array.from(atob(data), function(c) { return c.charCodeAt(0); });
+	var stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('gzip'));
+	new Response(stream).text().then(function(text) {
+		var index = JSON.parse(text);
+		// the columns of each word are stored as differences from the one before
+		for(var i = 0; i < index.columns.length; i++)
+		{
+			var deltas = index.columns[i];
+			var columnsOfWord = new Int32Array(deltas.length);
+			var column = 0;
+			for(var j = 0; j < deltas.length; j++)
+			{
+				column += deltas[j];
+				columnsOfWord[j] = column;
+			}
+			index.columns[i] = columnsOfWord;
+		}
+		searchIndex = index;
+		searchStatus.textContent = '';
+		if(searchBox.value != '')
+			search();
+	});
+}
+
+function loadSearchIndex()
+{
+	if(searchLoading)
+		return;
+	searchLoading = true;
+	searchStatus.textContent = 'loading...';
+	var script = document.createElement('script');
+	script.src = searchFile + (viewVersion > 0 ? '?v=' + viewVersion : '');
+	script.onload = function() { script.remove(); };
+	document.head.appendChild(script);
+}
+
+// the first index in the sorted list where the key could go
+function lowerBound(length, keyAt, key)
+{
+	var low = 0;
+	var high = length;
+	while(low < high)
+	{
+		var mid = (low + high) >> 1;
+		if(keyAt(mid) < key)
+			low = mid + 1;
+		else
+			high = mid;
+	}
+	return low;
+}
+
+// the columns, in order, that match every word of the query, where each word may be the start of a longer word or commit id
+function findColumns(query)
+{
+	var words = query.toLowerCase().match(/[a-z0-9]+/g) || [];
+	var found = null;
+	for(var w = 0; w < words.length; w++)
+	{
+		var word = words[w];
+		var matches = new Set();
+		var i = lowerBound(searchIndex.words.length, function(i) { return searchIndex.words[i]; }, word);
+		for(; i < searchIndex.words.length && searchIndex.words[i].startsWith(word); i++)
+		{
+			var columnsOfWord = searchIndex.columns[i];
+			for(var j = 0; j < columnsOfWord.length; j++)
+				matches.add(columnsOfWord[j]);
+		}
+		if(/^[0-9a-f]+$/.test(word))
+		{
+			var shaOrder = searchIndex.shaOrder;
+			var names = (searchIndex.names !== undefined ? searchIndex.names : columns);
+			var i = lowerBound(shaOrder.length, function(i) { return names[shaOrder[i]]; }, word);
+			for(; i < shaOrder.length && names[shaOrder[i]].startsWith(word); i++)
+				matches.add(shaOrder[i]);
+		}
+		if(found !== null)
+			matches = new Set(Array.from(found).filter(function(c) { return matches.has(c); }));
+		found = matches;
+	}
+	return Array.from(found || []).sort(function(a, b) { return a - b; });
+}
+
+function search()
+{
+	if(searchIndex === null)
+	{
+		loadSearchIndex();
+		return;
+	}
+	if(searchBox.value != searchQuery)
+	{
+		searchQuery = searchBox.value;
+		searchResults = findColumns(searchQuery);
+		searchPosition = 0;
+	}
+	else if(searchResults.length > 0)
+		searchPosition = (searchPosition + 1) % searchResults.length;
+	if(searchResults.length == 0)
+	{
+		searchStatus.textContent = 'no matches';
+		searchColumn = -1;
+		requestDraw();
+		return;
+	}
+	searchStatus.textContent = (searchPosition + 1) + ' of ' + searchResults.length;
+	searchColumn = searchResults[searchPosition];
+	var c = searchColumn;
+	withColumn(c, function() {
+		showInfo(c);
+		moveTo(c);
+		requestDraw();
+	});
+}
+
+searchBox.addEventListener('focus', loadSearchIndex);
+searchBox.addEventListener('keydown', function(event) {
+	if(event.key == 'Enter')
+		search();
+});
+
 function moveTo(count)
 {
-	sliding = true;
-	targetX = count * 48;
+	view.scrollTo({ left: count * columnWidth, top: view.scrollTop, behavior: 'smooth' });
 }
-update();
-window.addEventListener('scroll', function() {
-	document.getElementById('info').style.top = window.pageYOffset + 'px';
-	document.getElementById('info').style.left = window.pageXOffset + 'px';
-
-	var commitsPos = (window.scrollY + 96);
-	var branchesPos = (window.pageXOffset + 256 - document.getElementById('branches').offsetWidth);
-	if(document.getElementById('commits').offsetTop != commitsPos)
-		document.getElementById('commits').style.top = commitsPos + 'px';
-	if(document.getElementById('branches').offsetLeft != branchesPos)
-		document.getElementById('branches').style.left = branchesPos + 'px';
+
+view.addEventListener('scroll', requestDraw);
+window.addEventListener('resize', requestDraw);
+view.addEventListener('mousemove', function(event) {
+	var rect = view.getBoundingClientRect();
+	var x = event.clientX - rect.left;
+	var y = event.clientY - rect.top;
+	if(y < rowHeight && x >= labelWidth)
+	{
+		var c = Math.floor((x - labelWidth + view.scrollLeft) / columnWidth);
+		if(c < columns.length)
+			showInfo(c);
+	}
+	if(x < labelWidth && y >= rowHeight && aheadBehindBranches.length > 0)
+	{
+		var r = Math.floor((y - rowHeight + view.scrollTop) / rowHeight);
+		if(r < rows.length && rows[r].length > 4)
+			showAheadBehind(r);
+	}
+	view.style.cursor = (x < labelWidth && y >= rowHeight) ? 'pointer' : 'default';
 });
-</script>
-<script>
-var infos = {}
-''', file = f)
-for i in range(0, len(commitsByDate)):
-	commit = commitsByDate[i]
-	print('infos["' + commit['name'] + '"]="' + commit['name'] + '<br />' + datetime.datetime.fromtimestamp(commit['date']).strftime('%Y-%m-%d %H:%M:%S') + ' ' + commit['author'] + '<br />' + commit['desc'].replace('"', '&quot;').replace('\\', '\\\\') + '";', file = f)
-print('''
+view.addEventListener('click', function(event) {
+	var rect = view.getBoundingClientRect();
+	var x = event.clientX - rect.left;
+	var y = event.clientY - rect.top;
+	if(x < labelWidth && y >= rowHeight)
+	{
+		var r = Math.floor((y - rowHeight + view.scrollTop) / rowHeight);
+		if(r < rows.length && rows[r][2] >= 0)
+			withColumn(rows[r][2], function() { moveTo(rows[r][2]); });
+	}
+});
+
+// the row as it is after columns are added at the start and the columns past numColumns are dropped
+function shiftRow(row, added, numColumns)
+{
+	var runs = row[3].slice();
+	if(runs.length > 0)
+		runs[0] += added;
+	var total = 0;
+	for(var i = 0; i < runs.length; i++)
+	{
+		if(total + runs[i] >= numColumns)
+		{
+			runs[i] = numColumns - total;
+			runs.length = (runs[i] > 0 && i % 2 == 1) ? i + 1 : i - (i % 2 == 0 ? 0 : 1);
+			break;
+		}
+		total += runs[i];
+	}
+	var latest = (row[2] >= 0 && row[2] + added < numColumns) ? row[2] + added : -1;
+	return [row[0], row[1], latest, runs].concat(row.slice(4));
+}
+
+function applyUpdate(update)
+{
+	var kept = update.numColumns - update.added;
+	if(update.added >= 0)
+	{
+		columns = update.columnsAdded.concat(columns.slice(0, kept));
+		columnKinds = update.kindsAdded + columnKinds.substr(0, kept);
+		for(var r = 0; r < rows.length; r++)
+			rows[r] = shiftRow(rows[r], update.added, update.numColumns);
+	}
+	else
+	{
+		columns = update.columns;
+		columnKinds = update.columnKinds;
+	}
+	if(update.levelsAdded !== undefined)
+		columnLevels = update.levelsAdded + columnLevels.substr(0, kept);
+	else
+		columnLevels = update.columnLevels;
+	if(update.rows !== undefined)
+		rows = update.rows;
+	else
+		for(var r in update.changedRows)
+			rows[r] = update.changedRows[r];
+	infoPrefixLength = update.infoPrefixLength;
+	viewVersion = update.version;
+	rowBounds = [];
+	infoShards.clear();
+	hoveredColumn = -1;
+	searchIndex = null;
+	searchLoading = false;
+	searchQuery = '';
+	searchColumn = -1;
+	document.getElementById('space').style.width = (labelWidth + columns.length * columnWidth) + 'px';
+	document.getElementById('space').style.height = (rowHeight + rows.length * rowHeight) + 'px';
+	if(update.added > 0 && view.scrollLeft > 0)
+		view.scrollLeft += update.added * columnWidth;
+	requestDraw();
+}
+
+if(liveUpdates)
+{
+	var events = new EventSource('events');
+	events.addEventListener('update', function(event) {
+		var update = JSON.parse(event.data);
+		if(update.version != viewVersion + 1)
+			location.reload(); // an update was missed
+		else
+			applyUpdate(update);
+	});
+	// the side files of an update are written after it is sent, so the ones loaded in between are loaded again,
+	// and a page that was loaded before an update that it did not get is loaded again once the page has been written
+	events.addEventListener('written', function(event) {
+		var version = parseInt(event.data);
+		if(version > viewVersion)
+			location.reload();
+		else if(version == viewVersion)
+		{
+			infoShards.clear();
+			searchIndex = null;
+			searchLoading = false;
+		}
+	});
+}
+
+requestDraw();
 </script>
 </body></html>
-''', file = f)
+'''
+
+def page (view):
+	yield from pageHead()
+	yield from pageData(view)
+	yield from pageScript()
+
+infoDirectory = outputPath[:-5] + '-infos'
+
+# yields a temporary name to write the file as, which then replaces the file in one step, so that a served page never reads it half written
+@contextlib.contextmanager
+def replacingFile (fileName):
+	tempName = fileName + '.new'
+	try:
+		yield tempName
+		os.replace(tempName, fileName)
+	finally:
+		if os.path.exists(tempName):
+			os.remove(tempName)
+
+def infoShardKey (view, c):
+	if c in view['columnTags']:
+		return 'tags'
+	return columnName(view, c)[:view['infoPrefixLength']]
+
+def infoShards (view):
+	shards = {}
+	for c in range(0, view['numColumns']):
+		shards.setdefault(infoShardKey(view, c), []).append(c)
+	return shards
+
+# with oldView, the view whose shards were written last, only the shards whose commits changed are written
+def writeInfoShards (view, oldView = None):
+	shards = infoShards(view)
+	oldShards = (infoShards(oldView) if oldView is not None else {})
+	if not os.path.isdir(infoDirectory):
+		os.mkdir(infoDirectory)
+	for fileName in os.listdir(infoDirectory):
+		if fileName.endswith('.js') and fileName[:-3] not in shards:
+			os.remove(os.path.join(infoDirectory, fileName))
+	for key in shards:
+		if key != 'tags' and key in oldShards and [columnName(view, c) for c in shards[key]] == [columnName(oldView, c) for c in oldShards[key]]:
+			continue
+		with replacingFile(os.path.join(infoDirectory, key + '.js')) as tempName, open(tempName, 'w', buffering = outputBufferSize, encoding = 'UTF-8') as shardFile:
+			shardFile.write('infoShardLoaded(' + scriptJson(key) + ', {\n')
+			for c in shards[key]:
+				shardFile.write(scriptJson(columnName(view, c)) + ': ' + scriptJson(columnName(view, c) + '<br />' + datetime.datetime.fromtimestamp(columnInfoDate(view, c)).strftime('%Y-%m-%d %H:%M:%S') + ' ' + columnAuthor(view, c) + '<br />' + columnDesc(view, c)) + ',\n')
+			shardFile.write('});\n')
+
+# the search index goes in a side file too, as gzipped json of the words in the commits and the columns that have them
+searchPath = outputPath[:-5] + '-search.js'
+
+def writeSearchIndex (view):
+	columnsOfWord = {}
+	for c in range(0, view['numColumns']):
+		text = html.unescape(columnAuthor(view, c) + ' ' + columnDesc(view, c).replace('<br />', ' '))
+		if c in view['columnTags']:
+			text += ' ' + view['columnTags'][c]
+		for word in set(re.findall('[a-z0-9]+', text.lower())):
+			columnsOfWord.setdefault(word, []).append(c)
+	words = sorted(columnsOfWord)
+	index = {}
+	index['words'] = words
+	index['columns'] = [[wordColumns[0]] + [wordColumns[i] - wordColumns[i - 1] for i in range(1, len(wordColumns))] for wordColumns in [columnsOfWord[word] for word in words]]
+	index['shaOrder'] = sorted(range(0, view['numColumns']), key = lambda c : columnName(view, c))
+	if pageSize is not None:
+		index['names'] = [columnName(view, c) for c in range(0, view['numColumns'])] # the page has only the columns it has loaded
+	data = base64.b64encode(gzip.compress(json.dumps(index, separators = (',', ':')).encode('UTF-8'), 9)).decode('ascii')
+	with replacingFile(searchPath) as tempName, open(tempName, 'w', encoding = 'UTF-8') as searchFile:
+		searchFile.write('searchIndexLoaded("' + data + '");\n')
+
+# with a page size, the columns past the first page go in side files of that many columns each, with an index of them
+pagesDirectory = outputPath[:-5] + '-pages'
+
+def writePages (view):
+	numColumns = view['numColumns']
+	if not os.path.isdir(pagesDirectory):
+		os.mkdir(pagesDirectory)
+	numPages = max(1, (numColumns + pageSize - 1) // pageSize)
+	for fileName in os.listdir(pagesDirectory):
+		if fileName.endswith('.js') and fileName != 'index.js' and not (fileName[:-3].isdigit() and 0 < int(fileName[:-3]) < numPages):
+			os.remove(os.path.join(pagesDirectory, fileName))
+	# [first column, number of columns, newest date, oldest date] of each page
+	index = {}
+	index['pageSize'] = pageSize
+	index['numColumns'] = numColumns
+	index['pages'] = []
+	for p in range(0, numPages):
+		start = p * pageSize
+		end = min(numColumns, start + pageSize)
+		index['pages'].append([start, end - start, (columnDate(view, start) if end > start else 0), (columnDate(view, end - 1) if end > start else 0)])
+		if p == 0:
+			continue
+		mask = (1 << (end - start)) - 1
+		pageContent = {}
+		pageContent['columns'] = [columnName(view, c) for c in range(start, end)]
+		pageContent['columnKinds'] = ''.join([columnKind(view, c) for c in range(start, end)])
+		pageContent['columnLevels'] = levelDigits(view, start, end)
+		pageContent['runs'] = [rowrender.bitRuns((view['branches'][branchName]['row'] >> start) & mask, end - start) for branchName in view['rowBranchNames']]
+		with replacingFile(os.path.join(pagesDirectory, str(p) + '.js')) as tempName, open(tempName, 'w', buffering = outputBufferSize, encoding = 'UTF-8') as pageFile:
+			pageFile.write('pageLoaded(' + str(p) + ', ' + scriptJson(pageContent) + ');\n')
+	with replacingFile(os.path.join(pagesDirectory, 'index.js')) as tempName, open(tempName, 'w', encoding = 'UTF-8') as indexFile:
+		indexFile.write('pageIndexLoaded(' + scriptJson(index) + ');\n')
+
+# the matrix of the view for other tools, see viewmatrix.py
+matrixPaths = {'jsonl': outputPath[:-5] + '-matrix.jsonl', 'binary': outputPath[:-5] + '-matrix.bin'}
+
+def viewMatrix (view):
+	store = view['store']
+	matrix = viewmatrix.newMatrix(integrationBranchNames)
+	for c in range(0, view['numColumns']):
+		commit = view['columnCommits'][c]
+		date = (view['tagDates'].get(view['columnTags'][c], commitstore.date(store, commit)) if c in view['columnTags'] else commitstore.date(store, commit))
+		matrix['columns'].append([columnName(view, c), columnKind(view, c), levelOfColumn(view, c), date, commitstore.name(store, commit)])
+	for branchName in view['rowBranchNames']:
+		branch = view['branches'][branchName]
+		latest = (view['commitColumns'][branch['latestcommit']] if branch['latestcommit'] >= 0 else -1)
+		matrix['branches'].append([branchName, branch['display'], branch['local'], branch['head'], branch['level'], latest, branch['row']])
+	return matrix
+
+def writeMatrix (view):
+	matrix = viewMatrix(view)
+	if 'jsonl' in exportFormats:
+		with replacingFile(matrixPaths['jsonl']) as tempName:
+			viewmatrix.writeJsonLines(matrix, tempName)
+	if 'binary' in exportFormats:
+		with replacingFile(matrixPaths['binary']) as tempName:
+			viewmatrix.writeBinary(matrix, tempName)
+
+# the branch's row as it is after columns are added at the start and the columns past numColumns are dropped, like shiftRow in the page,
+# with its bits rather than their runs, so that rows can be compared without rendering them
+def shiftedRow (view, branchName, added, numColumns):
+	branch = view['branches'][branchName]
+	latest = (view['commitColumns'][branch['latestcommit']] + added if branch['latestcommit'] >= 0 else -1)
+	return [branch['display'], branch['level'], (latest if latest < numColumns else -1), (branch['row'] << added) & ((1 << numColumns) - 1), branch.get('aheadBehind', None)]
+
+# the number of columns added at the start of the old view's to make the new view's, with the old columns past the new number of
+# columns dropped, or -1 if the columns changed otherwise
+def addedColumns (oldView, newView):
+	oldColumns = [columnName(oldView, c) for c in range(0, oldView['numColumns'])]
+	newColumns = [columnName(newView, c) for c in range(0, newView['numColumns'])]
+	added = (newColumns.index(oldColumns[0]) if len(oldColumns) > 0 and oldColumns[0] in newColumns else len(newColumns))
+	if newColumns[added:] != oldColumns[:len(newColumns) - added]:
+		return -1
+	return added
+
+# the changes from one view to the next, for the open pages to apply with applyUpdate
+# when the old columns are still there after the new ones, only the new columns and the rows that changed otherwise are sent
+def viewUpdate (oldView, newView):
+	update = {}
+	newColumns = [columnName(newView, c) for c in range(0, newView['numColumns'])]
+	newKinds = ''.join([columnKind(newView, c) for c in range(0, newView['numColumns'])])
+	oldLevels = levelDigits(oldView, 0, oldView['numColumns'])
+	newLevels = levelDigits(newView, 0, newView['numColumns'])
+	added = addedColumns(oldView, newView)
+	update['numColumns'] = len(newColumns)
+	update['added'] = added
+	if added >= 0:
+		update['columnsAdded'] = newColumns[:added]
+		update['kindsAdded'] = newKinds[:added]
+	else:
+		update['columns'] = newColumns
+		update['columnKinds'] = newKinds
+	if added >= 0 and newLevels[added:] == oldLevels[:len(newColumns) - added]:
+		update['levelsAdded'] = newLevels[:added]
+	else:
+		update['columnLevels'] = newLevels
+	oldDisplays = [oldView['branches'][branchName]['display'] for branchName in oldView['rowBranchNames']]
+	newDisplays = [newView['branches'][branchName]['display'] for branchName in newView['rowBranchNames']]
+	if added < 0 or oldDisplays != newDisplays:
+		update['rows'] = [rowData(newView, branchName) for branchName in newView['rowBranchNames']]
+	else:
+		changed = [r for r in range(0, len(newDisplays)) if shiftedRow(newView, newView['rowBranchNames'][r], 0, len(newColumns)) != shiftedRow(oldView, oldView['rowBranchNames'][r], added, len(newColumns))]
+		update['changedRows'] = dict([(r, rowData(newView, newView['rowBranchNames'][r])) for r in changed])
+	update['infoPrefixLength'] = newView['infoPrefixLength']
+	return update
+
+# serves the view and keeps it up to date until interrupted, reading only the new commits whenever the refs change
+def serveView (path, cache, view):
+	rowrender.startWorkers(renderWorkers) # before the server's threads
+	server = viewserver.startServer(os.path.dirname(outputPath), servePort)
+	print('Serving http://localhost:' + str(servePort) + '/' + os.path.basename(outputPath))
+	viewserver.broadcast(server, 'written', str(view['version']), True)
+	state = {}
+	state['view'] = view # the view of the open pages
+	state['written'] = view # the view whose page and side files were written last
+	# each update is read from the view before it, and sent before its page and side files are written, which the pages are then told of
+	# an update that fails is reported and the old view kept, so that the next change of the refs tries again
+	def refresh ():
+		try:
+			oldView = state['view']
+			newView = readView(path, cache, oldView)
+			newView['version'] = oldView['version'] + 1
+			update = viewUpdate(oldView, newView)
+			update['version'] = newView['version']
+			viewserver.broadcast(server, 'update', json.dumps(update, separators = (',', ':')))
+			state['view'] = newView
+			commitcache.saveCache(cache, cacheSize)
+			writeView(newView, state['written'])
+			state['written'] = newView
+			viewserver.broadcast(server, 'written', str(newView['version']), True)
+		except Exception:
+			print('Error: the view could not be updated.')
+			traceback.print_exc()
+	viewserver.watchRefs(gitlog.findGitDir(path), refresh)
+
+# writes the page and its side files for the view, and with oldView, the view that they were written for last, only what changed
+def writeView (view, oldView = None):
+	runstats.phase('infos')
+	writeInfoShards(view, oldView)
+	runstats.phase('search')
+	writeSearchIndex(view)
+	if pageSize is not None:
+		runstats.phase('pages')
+		writePages(view)
+	if len(exportFormats) > 0:
+		runstats.phase('export')
+		writeMatrix(view)
+	runstats.phase('page')
+	with replacingFile(outputPath + ('.gz' if gzipOutput else '')) as tempName:
+		if gzipOutput:
+			f = gzip.open(tempName, 'wt', compresslevel = 6, encoding = 'UTF-8')
+		else:
+			f = open(tempName, 'w', buffering = outputBufferSize, encoding = 'UTF-8')
+		with f:
+			f.writelines(page(view))
+
+# writes the stats of the run so far next to the page, counting what the view shows
+statsPath = outputPath[:-5] + '-stats.json'
+
+def writeStats (view):
+	runstats.count('commits', commitstore.count(view['store']))
+	runstats.count('branches', len(view['branches']))
+	runstats.count('columns', view['numColumns'])
+	runstats.count('cells', view['numColumns'] * len(view['rowBranchNames']))
+	runstats.count('cellsInBranches', sum([bin(view['branches'][branchName]['row']).count('1') for branchName in view['rowBranchNames']]))
+	runstats.write(statsPath, [outputPath + ('.gz' if gzipOutput else ''), infoDirectory, searchPath] + ([pagesDirectory] if pageSize is not None else []) + [matrixPaths[exportFormat] for exportFormat in exportFormats])
+
+if not os.path.isdir(path) or gitlog.findGitDir(path) is None:
+	print('Error: ' + path + ' is not a git repository.')
+	exit(1)
+
+if recordStats:
+	runstats.start()
+
+if useNative:
+	gitlog.useNative(path)
+
+# the window, as unix times
+if sinceText is not None:
+	since = gitlog.readDate(path, sinceText)
+if untilText is not None:
+	until = gitlog.readDate(path, untilText)
+if (sinceText is not None and since is None) or (untilText is not None and until is None):
+	print('Error: git cannot read the dates of the window.')
+	exit(1)
+
+# make sure we have all the infos, unless they were fetched recently enough
+if fetchMode != 'skip' and fetchMaxAge is not None:
+	age = gitlog.fetchAge(path)
+	if age is not None and age < fetchMaxAge:
+		fetchMode = 'skip'
+fetch = None
+if fetchMode != 'skip':
+	fetch = gitlog.startFetch(path)
+if fetchMode == 'wait':
+	runstats.phase('fetch')
+	gitlog.finishFetch(fetch)
+	fetch = None
 
+runstats.phase('cache')
+cache = commitcache.openCache(path, useCache)
+try:
+	view = readView(path, cache)
+	runstats.phase('cache')
+	commitcache.saveCache(cache, cacheSize)
+	writeView(view)
+	if recordStats:
+		writeStats(view)
+	if servePort is not None:
+		serveView(path, cache, view) # the fetch moving branches shows up like any other change
+	elif fetch is not None:
+		# write the page again if the fetch moved anything
+		runstats.phase('fetch')
+		gitlog.finishFetch(fetch)
+		if gitlog.readRefs(path) != view['refs']:
+			view = readView(path, cache)
+			runstats.phase('cache')
+			commitcache.saveCache(cache, cacheSize)
+			writeView(view)
+			if recordStats:
+				writeStats(view)
+except KeyboardInterrupt:
+	pass
+finally:
+	commitcache.closeCache(cache, cacheSize)
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+
+# shared git access for git-view.py and node-view.py
+
+import os
+import subprocess
+import tempfile
+import threading
+import time
+import nativegit
+
+gitPath = '/usr/bin/git'
+
+# the git command, like 'log', to how many times it was run and how many bytes it wrote, for runstats
+gitCalls = {}
+
+def countGitCall (args, numBytes):
+	command = args.split(' ')[0]
+	if command not in gitCalls:
+		gitCalls[command] = {'calls': 0, 'bytes': 0}
+	gitCalls[command]['calls'] += 1
+	gitCalls[command]['bytes'] += numBytes
+
+# the repos, by path, that read refs and the commit-graph natively instead of running git, see useNative
+nativeRepos = {}
+
+# the fields of each record that readLog asks git for, NUL-separated
+logFormat = '%H%x00%P%x00%at%x00%an%x20<%ae>%x00%B%x00%ct'
+logFieldCount = 6
+
+# how much of git's output streamGit reads at a time
+streamChunkSize = 1 << 16
+
+def callGitRaw (path, args, failOnError = True, input = None):
+	pr = subprocess.Popen([gitPath] + args.split(' '), cwd=path, shell = False, stdin = (subprocess.PIPE if input is not None else None), stdout = subprocess.PIPE, stderr = subprocess.PIPE )
+	(out, error) = pr.communicate(input)
+	countGitCall(args, len(out))
+	if len(error) != 0 and failOnError:
+		print('Error: ' + error.decode('UTF-8'))
+		return None
+	else:
+		return out
+
+def callGit (path, args, failOnError = True):
+	out = callGitRaw(path, args, failOnError)
+	if out is None:
+		return None
+	return out.decode('UTF-8', 'replace').split('\n')
+
+# runs git and yields its output a record at a time, split at the separator, as git writes it, so the whole output is never held at once
+# any errors are printed when the output ends, and if the records stop being taken before then, git is stopped
+# the input is written from a thread and errors go to a temporary file, since git blocks on a full pipe, and commands like cat-file
+# write their output while still reading their input
+def streamGit (path, args, separator = b'\n', input = None, failOnError = True):
+	errorFile = tempfile.TemporaryFile()
+	pr = subprocess.Popen([gitPath] + args.split(' '), cwd=path, shell = False, stdin = (subprocess.PIPE if input is not None else subprocess.DEVNULL), stdout = subprocess.PIPE, stderr = errorFile )
+	numBytes = 0
+	writer = None
+	if input is not None:
+		def writeInput ():
+			try:
+				pr.stdin.write(input)
+				pr.stdin.close()
+			except OSError:
+				pass # git stopped early, and says why on stderr
+		writer = threading.Thread(target = writeInput, daemon = True)
+		writer.start()
+	try:
+		pending = b''
+		while True:
+			chunk = pr.stdout.read1(streamChunkSize)
+			if len(chunk) == 0:
+				break
+			numBytes += len(chunk)
+			records = (pending + chunk).split(separator)
+			pending = records.pop()
+			yield from records
+		if len(pending) > 0:
+			yield pending
+		pr.wait()
+		errorFile.seek(0)
+		error = errorFile.read()
+		if len(error) != 0 and failOnError:
+			print('Error: ' + error.decode('UTF-8', 'replace'))
+	finally:
+		countGitCall(args, numBytes)
+		if pr.poll() is None:
+			pr.kill()
+		pr.wait()
+		if writer is not None:
+			writer.join()
+		pr.stdout.close()
+		errorFile.close()
+
+# starts fetching from every remote of the repo, in parallel, pruning deleted branches, and returns the running fetch for finishFetch
+def startFetch (path, jobs = 4):
+	countGitCall('fetch', 0)
+	return subprocess.Popen([gitPath, 'fetch', '--all', '-p', '--jobs=' + str(jobs)], cwd=path, shell = False, stdin = subprocess.DEVNULL, stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL)
+
+# waits for the fetch to end, returning true if it succeeded
+def finishFetch (fetch):
+	return fetch.wait() == 0
+
+# returns the seconds since the repo last fetched, or None if it never has
+def fetchAge (path):
+	gitDir = findGitDir(path)
+	if gitDir is None or not os.path.isfile(os.path.join(gitDir, 'FETCH_HEAD')):
+		return None
+	return time.time() - os.path.getmtime(os.path.join(gitDir, 'FETCH_HEAD'))
+
+# reads the refs and the commit-graph of the repo at path natively from now on, returning false if its git directory was not found
+# git is still run for what the commit-graph does not have, and for everything if the repo has no commit-graph
+def useNative (path):
+	gitDir = nativegit.findGitDir(path)
+	if gitDir is None:
+		return False
+	repo = {}
+	repo['gitDir'] = gitDir
+	repo['graph'] = nativegit.openCommitGraph(gitDir)
+	nativeRepos[path] = repo
+	return True
+
+# returns None, without printing git's error, if path is not in a repo
+def findGitDir (path):
+	if path in nativeRepos:
+		return nativeRepos[path]['gitDir']
+	lines = callGit(path, 'rev-parse --absolute-git-dir', False)
+	if lines is None or lines[0] == '':
+		return None
+	return lines[0]
+
+# returns [parents, commitDate] of the commit from the commit-graph, or None if it is not there or not read natively
+def readGraphCommit (path, name):
+	if path not in nativeRepos or nativeRepos[path]['graph'] is None:
+		return None
+	graph = nativeRepos[path]['graph']
+	position = nativegit.graphFind(graph, name)
+	if position is None:
+		return None
+	(parentPositions, commitDate, generation) = nativegit.graphCommit(graph, position)
+	return [[nativegit.graphName(graph, parent) for parent in parentPositions], commitDate]
+
+# returns true if the ancestor commit can be reached from the descendant, from the commit-graph if read natively and from git otherwise,
+# or None if git cannot tell either, like when a commit is missing
+def isAncestor (path, ancestorName, descendantName):
+	if path in nativeRepos and nativeRepos[path]['graph'] is not None:
+		result = nativegit.graphIsAncestor(nativeRepos[path]['graph'], ancestorName, descendantName)
+		if result is not None:
+			return result
+	pr = subprocess.run([gitPath, 'merge-base', '--is-ancestor', ancestorName, descendantName], cwd = path, stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL)
+	countGitCall('merge-base', 0)
+	return (pr.returncode == 0 if pr.returncode in [0, 1] else None)
+
+# returns the unix time of a date given the way git takes it, like '2024-01-31' or '2.weeks.ago', or None if git cannot read it
+def readDate (path, text):
+	lines = callGit(path, 'rev-parse --since=' + text.replace(' ', '.'))
+	if lines is None or not lines[0].startswith('--max-age='):
+		return None
+	return int(lines[0][10:])
+
+# returns a list of [refName, commitName] for every ref under the given prefixes, skipping symbolic refs like origin/HEAD
+def readRefs (path, prefixes = 'refs/heads refs/remotes'):
+	if path in nativeRepos:
+		return nativegit.readRefs(nativeRepos[path]['gitDir'], prefixes)
+	refs = []
+	for line in streamGit(path, 'for-each-ref --format=%(refname)%00%(objectname)%00%(symref) ' + prefixes):
+		if len(line) == 0:
+			continue
+		(refName, commitName, symRef) = line.decode('UTF-8', 'replace').split('\0')
+		if symRef != '':
+			continue
+		refs.append([refName, commitName])
+	return refs
+
+# returns a list of [tagName, commitName, taggerDate] for every tag in one listing, with annotated tags peeled to what they point to
+# taggerDate is None for lightweight tags
+# this is done by git even for repos read natively, since the tagger dates are in the tag objects, not in packed-refs
+# for-each-ref peels only one level, so the tags of tags are peeled to their commits with one cat-file for all of them
+def readTags (path):
+	tags = []
+	nestedTags = []
+	for line in streamGit(path, 'for-each-ref --format=%(refname)%00%(objectname)%00%(*objectname)%00%(*objecttype)%00%(taggerdate:unix) refs/tags'):
+		if len(line) == 0:
+			continue
+		(refName, objectName, peeledName, peeledType, taggerDate) = line.decode('UTF-8', 'replace').split('\0')
+		if peeledType == 'tag':
+			nestedTags.append(len(tags))
+		tags.append([refName[10:], (peeledName if peeledName != '' else objectName), (int(taggerDate) if taggerDate != '' else None)])
+	if len(nestedTags) > 0:
+		lines = streamGit(path, 'cat-file --batch-check=%(objectname)', b'\n', ''.join([tags[t][1] + '^{commit}\n' for t in nestedTags]).encode('UTF-8'))
+		for (t, line) in zip(nestedTags, lines):
+			if not line.endswith(b' missing'):
+				tags[t][1] = line.decode('ascii')
+	return tags
+
+# walks the history of all of the heads at once and yields [name, parents, date, author, message, commitDate] for each commit, newest first
+# heads may also be '^name' to leave out the history of a commit, and heads that no longer exist are ignored
+# without walk, only the given commits are read, and with since, the walk stops at commits older than that unix time
+# with until, a unix time, the newer commits are walked through but not written, nor counted in maxCount
+# each commit is yielded as soon as git has written it, and bytes that are not valid UTF-8 in authors and messages are replaced
+def readLog (path, heads, maxCount = None, walk = True, since = None, until = None):
+	if len(heads) == 0:
+		return
+	args = 'log -z --format=' + logFormat + ' --ignore-missing --stdin'
+	if not walk:
+		args += ' --no-walk=unsorted'
+	if maxCount is not None:
+		args += ' -n ' + str(maxCount)
+	if since is not None:
+		args += ' --max-age=' + str(since)
+	if until is not None:
+		args += ' --min-age=' + str(until)
+	fields = []
+	for field in streamGit(path, args, b'\0', ('\n'.join(heads) + '\n').encode('UTF-8')):
+		fields.append(field)
+		if len(fields) < logFieldCount:
+			continue
+		name = fields[0].decode('ascii').strip()
+		parents = fields[1].decode('ascii').split()
+		date = int(fields[2])
+		author = fields[3].decode('UTF-8', 'replace')
+		message = fields[4].decode('UTF-8', 'replace')
+		commitDate = int(fields[5])
+		fields = []
+		yield [name, parents, date, author, message, commitDate]
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+
+# reads refs and the commit-graph file straight from the git directory, so that the history can be walked without running git
+# commit messages are not in the commit-graph, so those still come from git, as does everything for repos without one
+
+import mmap
+import os
+import struct
+
+noParent = 0x70000000 # a parent position meaning there is no parent
+extraEdges = 0x80000000 # set on the second parent position when the parents continue in the EDGE chunk
+hashLengths = {1: 20, 2: 32} # by the hash version in the commit-graph header, for sha1 and sha256
+
+# returns the git directory of the repo at path, or None if it cannot be found
+def findGitDir (path):
+	dotGit = os.path.join(path, '.git')
+	if os.path.isfile(dotGit):
+		with open(dotGit) as f:
+			line = f.read().strip()
+		if line.startswith('gitdir: '):
+			return os.path.normpath(os.path.join(path, line[8:]))
+	if os.path.isdir(dotGit):
+		return os.path.normpath(dotGit)
+	if os.path.isfile(os.path.join(path, 'HEAD')) and os.path.isdir(os.path.join(path, 'objects')):
+		return os.path.normpath(path) # a bare repo
+	return None
+
+# worktrees keep the refs and objects that they share in a common git directory
+def commonDir (gitDir):
+	fileName = os.path.join(gitDir, 'commondir')
+	if os.path.isfile(fileName):
+		with open(fileName) as f:
+			return os.path.normpath(os.path.join(gitDir, f.read().strip()))
+	return gitDir
+
+# returns a list of [refName, commitName] for every ref under the given prefixes, sorted like git for-each-ref and skipping symbolic refs
+def readRefs (gitDir, prefixes = 'refs/heads refs/remotes'):
+	prefixes = [prefix.rstrip('/') + '/' for prefix in prefixes.split(' ')]
+	refs = {}
+	packedRefsFileName = os.path.join(commonDir(gitDir), 'packed-refs')
+	if os.path.isfile(packedRefsFileName):
+		with open(packedRefsFileName, encoding = 'UTF-8') as f:
+			for line in f:
+				line = line.rstrip('\n')
+				if line.startswith('#') or line.startswith('^') or line == '':
+					continue
+				(commitName, refName) = line.split(' ', 1)
+				for prefix in prefixes:
+					if refName.startswith(prefix):
+						refs[refName] = commitName
+	for prefix in prefixes:
+		for (dirPath, dirNames, fileNames) in os.walk(os.path.join(commonDir(gitDir), prefix)):
+			for fileName in fileNames:
+				if fileName.endswith('.lock'):
+					continue # a ref that git is writing, which it renames into place when done
+				fullFileName = os.path.join(dirPath, fileName)
+				refName = os.path.relpath(fullFileName, commonDir(gitDir)).replace(os.sep, '/')
+				try:
+					with open(fullFileName, encoding = 'UTF-8') as f:
+						content = f.read().strip()
+				except FileNotFoundError:
+					continue # deleted since the walk listed it
+				if content.startswith('ref: '):
+					refs.pop(refName, None)
+				elif content != '':
+					refs[refName] = content
+	return [[refName, refs[refName]] for refName in sorted(refs)]
+
+def readGraphLayer (fileName):
+	with open(fileName, 'rb') as f:
+		data = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+	(signature, version, hashVersion, numChunks, numBases) = struct.unpack_from('>4sBBBB', data, 0)
+	if signature != b'CGPH' or version != 1 or hashVersion not in hashLengths:
+		return None
+	chunks = {}
+	for i in range(0, numChunks):
+		(chunkId, offset) = struct.unpack_from('>4sQ', data, 8 + 12 * i)
+		chunks[chunkId] = offset
+	if b'OIDF' not in chunks or b'OIDL' not in chunks or b'CDAT' not in chunks:
+		return None
+	layer = {}
+	layer['data'] = data
+	layer['hashLength'] = hashLengths[hashVersion]
+	layer['fanout'] = chunks[b'OIDF']
+	layer['lookup'] = chunks[b'OIDL']
+	layer['commits'] = chunks[b'CDAT']
+	layer['edges'] = chunks.get(b'EDGE', None)
+	layer['count'] = struct.unpack_from('>I', data, layer['fanout'] + 4 * 255)[0]
+	layer['base'] = 0 # the position of its first commit among the commits of all of the layers
+	return layer
+
+# opens the commit-graph of the repo, either a single file or a chain of split layers, or returns None if there is none
+def openCommitGraph (gitDir):
+	infoDir = os.path.join(commonDir(gitDir), 'objects', 'info')
+	chainFileName = os.path.join(infoDir, 'commit-graphs', 'commit-graph-chain')
+	if os.path.isfile(chainFileName):
+		with open(chainFileName) as f:
+			fileNames = [os.path.join(infoDir, 'commit-graphs', 'graph-' + line.strip() + '.graph') for line in f if line.strip() != '']
+	elif os.path.isfile(os.path.join(infoDir, 'commit-graph')):
+		fileNames = [os.path.join(infoDir, 'commit-graph')]
+	else:
+		return None
+	graph = {}
+	graph['layers'] = []
+	graph['count'] = 0
+	for fileName in fileNames:
+		layer = readGraphLayer(fileName)
+		if layer is None:
+			return None
+		layer['base'] = graph['count']
+		graph['layers'].append(layer)
+		graph['count'] += layer['count']
+	return graph
+
+def graphLayer (graph, position):
+	for layer in graph['layers']:
+		if position < layer['base'] + layer['count']:
+			return layer
+	return None
+
+def graphName (graph, position):
+	layer = graphLayer(graph, position)
+	start = layer['lookup'] + layer['hashLength'] * (position - layer['base'])
+	return layer['data'][start:start + layer['hashLength']].hex()
+
+# returns the position of the commit in the graph, or None if it is not in it
+def graphFind (graph, name):
+	try:
+		key = bytes.fromhex(name)
+	except ValueError:
+		return None
+	for layer in graph['layers']:
+		if len(key) != layer['hashLength']:
+			continue
+		data = layer['data']
+		low = (struct.unpack_from('>I', data, layer['fanout'] + 4 * (key[0] - 1))[0] if key[0] > 0 else 0)
+		high = struct.unpack_from('>I', data, layer['fanout'] + 4 * key[0])[0]
+		while low < high:
+			mid = (low + high) // 2
+			start = layer['lookup'] + layer['hashLength'] * mid
+			midKey = data[start:start + layer['hashLength']]
+			if midKey < key:
+				low = mid + 1
+			elif midKey > key:
+				high = mid
+			else:
+				return layer['base'] + mid
+	return None
+
+# returns [parentPositions, commitDate, generation] for the commit at the position
+def graphCommit (graph, position):
+	layer = graphLayer(graph, position)
+	data = layer['data']
+	(parent1, parent2, generationAndDate, lowDate) = struct.unpack_from('>IIII', data, layer['commits'] + (layer['hashLength'] + 16) * (position - layer['base']) + layer['hashLength'])
+	parents = []
+	if parent1 != noParent:
+		parents.append(parent1)
+	if parent2 & extraEdges and parent2 != noParent:
+		edge = parent2 & ~extraEdges
+		while True:
+			value = struct.unpack_from('>I', data, layer['edges'] + 4 * edge)[0]
+			parents.append(value & ~extraEdges)
+			if value & extraEdges:
+				break
+			edge += 1
+	elif parent2 != noParent:
+		parents.append(parent2)
+	return [parents, ((generationAndDate & 3) << 32) | lowDate, generationAndDate >> 2]
+
+# returns true if the ancestor commit can be reached from the descendant, using generation numbers to stop early,
+# or None if either is not in the graph
+def graphIsAncestor (graph, ancestorName, descendantName):
+	ancestor = graphFind(graph, ancestorName)
+	descendant = graphFind(graph, descendantName)
+	if ancestor is None or descendant is None:
+		return None
+	ancestorGeneration = graphCommit(graph, ancestor)[2]
+	seen = set([descendant])
+	stack = [descendant]
+	while len(stack) > 0:
+		position = stack.pop()
+		if position == ancestor:
+			return True
+		(parents, commitDate, generation) = graphCommit(graph, position)
+		if generation <= ancestorGeneration:
+			continue
+		for parent in parents:
+			if parent not in seen:
+				seen.add(parent)
+				stack.append(parent)
+	return False
@@ -1,51 +1,56 @@
 #!/usr/bin/env python3.2
 
-import subprocess
-import os
+import array
 import sys
-import time
-
-gitPath = '/usr/bin/git'
+import html
+import gitlog
+import commitcache
+import commitstore
+import runstats
 
 if len(sys.argv) < 2:
-	print("Syntax: py git-view.py <path-to-git-repo> <maximum-number-commits-on-each-branch>")
+	print("Syntax: py node-view.py <path-to-git-repo> [<maximum-number-commits-on-each-branch>] [no-cache] [cache-size=<number-of-commits>] [native] [stats]")
+	print("  Adding 'stats' writes the time taken by each phase, git's work and the peak memory used to 'html/git-view-stats.json'.")
 	exit(0)
 
 path = sys.argv[1]
 if path[-1] != "/":
 	path = path + "/"
 
-def callGit (args):
-	pr = subprocess.Popen([gitPath] + args.split(' '), cwd=path, shell = False, stdout = subprocess.PIPE, stderr = subprocess.PIPE )
-	(out, error) = pr.communicate()
-	if len(error) != 0:
-#		print("Error running git " + args + ":\n" + error.decode('UTF-8'))
-		return None
+numCommits = None
+useCache = True
+useNative = False
+recordStats = False
+cacheSize = commitcache.defaultMaxEntries
+for arg in sys.argv[2:]:
+	if arg == 'no-cache':
+		useCache = False
+	elif arg == 'native':
+		useNative = True
+	elif arg == 'stats':
+		recordStats = True
+	elif arg.startswith('cache-size='):
+		cacheSize = int(arg[11:])
 	else:
-		return out.decode('UTF-8').split('\n')
+		numCommits = int(arg)
+
+if recordStats:
+	runstats.start()
 
-def newCommit (name):
-	commit = {}
-	commit['name'] = name
-	commit['branches'] = set() # set of branches at this commit
-	commit['merge'] = [] # list of branch names from a merge
-	commit['parents'] = [] # list of parents commits (from merges or just previous commits)
-	commit['children'] = [] # list of children commits
-	commit['level'] = 0
-	return commit
+if useNative:
+	gitlog.useNative(path)
 
 # get branches
-branchLines = callGit('branch -a')
+runstats.phase('refs')
+refs = gitlog.readRefs(path)
+refHeads = {}
 activeBranchNames = []
-for branchLine in branchLines:
-	if len(branchLine) == 0:
-		continue
-	branchName = branchLine[2:]
-	if branchName.startswith('remotes/origin/HEAD'):
-		continue
-	if branchName.startswith('remotes/'):
-		continue
-	activeBranchNames.append(branchName)
+for (refName, commitName) in refs:
+	if refName.startswith('refs/remotes/'):
+		refHeads[refName[13:]] = commitName
+	else:
+		refHeads[refName[11:]] = commitName
+		activeBranchNames.append(refName[11:])
 branchNames = set()
 branchNames.update(activeBranchNames)
 
@@ -55,204 +60,159 @@ for branchName in activeBranchNames:
 	remoteBranchNames.append('origin/' + branchName)
 activeBranchNames.extend(remoteBranchNames)
 
-# get commits
-headCommits = []
-commits = {}
-commitsByDate = {}
-remotes = []
+# get commits, reading from git only what is not cached
+# the commits are kept in a store and referred to by their index in it
+runstats.phase('commits')
+store = commitstore.newStore()
+commitBranches = {} # the index of each commit that has branches to the set of them
 merges = []
+cache = commitcache.openCache(path, useCache)
+commitcache.updateRefs(path, cache, refs, numCommits)
 
 for branchName in activeBranchNames:
-	count = 0
-	lastCommit = None
-	logLines = callGit('log --date=raw ' + (('-n ' + sys.argv[2] + ' ') if len(sys.argv) == 3 else '') + branchName)
-	if logLines is None:
+	if branchName not in refHeads:
 		continue # not a valid branch, so ignore it
-	for logLine in logLines:
-		if logLine.startswith('commit '):
-			name = logLine[7:]
-			if name not in commits:
-				commit = newCommit(name)
-				commits[name] = commit
-			if lastCommit is None:	
-				commits[name]['branches'].add(branchName)
-			lastCommit = name
-		elif logLine.startswith('Date'):
-			date = int(logLine[8:-6])
-			commits[lastCommit]['date'] = date
-			commitsByDate[date] = lastCommit
-		elif logLine.startswith('    Merge branch \''):
-			fromBranchNameEndIndex = logLine.find('\'', 18)
-			firstRemote = (logLine[fromBranchNameEndIndex + 2:fromBranchNameEndIndex + 4] == 'of')
-			fromBranch = ('origin/' if firstRemote else '') + logLine[18:fromBranchNameEndIndex]
-			branchNames.add(fromBranch)
-			toBranchNameStartIndex = logLine.find('into ')
-			if toBranchNameStartIndex != -1:
-				toBranch = logLine[5 + toBranchNameStartIndex:]
-				branchNames.add(toBranch)
-			else:
-				toBranch = 'master' # if no to branch is named, it defaults to master
-				# BUG : this is slightly broken, because it may be either master or origin/master
-			merges.append([lastCommit, fromBranch, toBranch])
-		elif logLine.startswith('    Merge pull request'):
-			fromBranchNameStartIndex = logLine.rfind(' ') + 1
-			toBranch = ''
-			fromBranch = logLine[fromBranchNameStartIndex:]
-			branchNames.add(fromBranch)
-			merges.append([lastCommit, fromBranch, toBranch])
-
-# get parents of each commit
-dummyCommits = {}
-for commitName in commits:
-	commits[commitName]['parents'] = (callGit('rev-list --parents -n 1 ' + commitName)[0].split(' '))[1:]
-	for parentCommitName in commits[commitName]['parents']:
-		if parentCommitName in commits and commitName not in commits[parentCommitName]['children']:
-			commits[parentCommitName]['children'].append(commitName)
-		elif parentCommitName not in commits and parentCommitName not in dummyCommits:
-			# make a dummy commit
-			commit = newCommit(parentCommitName)
-			commit['date'] = min(commitsByDate) - 1
-			dummyCommits[parentCommitName] = commit
-			commitsByDate[commit['date']] = parentCommitName
-commits.update(dummyCommits)
+	first = True
+	for (name, commitParents, date, author, message, commitDate) in commitcache.readCommits(path, cache, [refHeads[branchName]], numCommits):
+		numBefore = commitstore.count(store)
+		commit = commitstore.addCommit(store, name, commitParents, date, author, message, commitDate)
+		if first:
+			commitBranches.setdefault(commit, set()).add(branchName)
+			first = False
+		if commitstore.count(store) == numBefore:
+			continue # already read from another branch
+		for logLine in message.split('\n'):
+			if logLine.startswith('Merge branch \''):
+				fromBranchNameEndIndex = logLine.find('\'', 14)
+				firstRemote = (logLine[fromBranchNameEndIndex + 2:fromBranchNameEndIndex + 4] == 'of')
+				fromBranch = ('origin/' if firstRemote else '') + logLine[14:fromBranchNameEndIndex]
+				branchNames.add(fromBranch)
+				toBranchNameStartIndex = logLine.find('into ')
+				if toBranchNameStartIndex != -1:
+					toBranch = logLine[5 + toBranchNameStartIndex:]
+					branchNames.add(toBranch)
+				else:
+					toBranch = 'master' # if no to branch is named, it defaults to master
+					# BUG : this is slightly broken, because it may be either master or origin/master
+				merges.append([commit, fromBranch, toBranch])
+			elif logLine.startswith('Merge pull request'):
+				fromBranchNameStartIndex = logLine.rfind(' ') + 1
+				toBranch = ''
+				fromBranch = logLine[fromBranchNameStartIndex:]
+				branchNames.add(fromBranch)
+				merges.append([commit, fromBranch, toBranch])
+commitcache.closeCache(cache, cacheSize)
+
+# link the parents and children of each commit, with the parents that were not read becoming dummy commits older than the rest
+runstats.phase('links')
+commitstore.finishStore(store)
+numStoreCommits = commitstore.count(store)
+readDates = [commitstore.date(store, i) for i in range(0, numStoreCommits) if not commitstore.isStub(store, i)]
+oldestDate = min(readDates) if len(readDates) > 0 else 0
+for i in range(0, numStoreCommits):
+	if commitstore.isStub(store, i):
+		commitstore.setDate(store, i, oldestDate - 1)
+
+# order the commits once, every commit before its parents and the newest first otherwise, so commits with the same date are all kept
+runstats.phase('order')
+order = commitstore.childrenFirst(store, True)
+
+def branchesOf (commit):
+	return commitBranches.get(commit, set())
+
+def addBranches (commit, names):
+	commitBranches.setdefault(commit, set()).update(names)
 
 # fill in branch info based on merge comments
+runstats.phase('branches')
 for merge in merges:
-	commitName = merge[0]
+	commit = merge[0]
 	fromBranch = merge[1]
 	toBranch = merge[2]
-	if commits[commitName]['parents'][0] in commits:
+	commitParents = commitstore.parents(store, commit)
+	if len(commitParents) > 0:
 		if toBranch != '':
-			commits[commitName]['branches'].add(toBranch)
-			commits[commits[commitName]['parents'][0]]['branches'].add(toBranch)
+			addBranches(commit, [toBranch])
+			addBranches(commitParents[0], [toBranch])
 		else:
-			commits[commits[commitName]['parents'][0]]['branches'].update(commits[commitName]['branches'])
-	if commits[commitName]['parents'][1] in commits:
+			addBranches(commitParents[0], branchesOf(commit))
+	if len(commitParents) > 1:
 		if fromBranch != '':
-			commits[commits[commitName]['parents'][1]]['branches'].add(fromBranch)
+			addBranches(commitParents[1], [fromBranch])
 
 # propagate the branches to the ancestors
-for date in sorted(commitsByDate.keys(), reverse=True):
-	commitName = commitsByDate[date]
-	if len(commits[commitName]['parents']) == 1:
-		if commits[commitName]['parents'][0] in commits:
-			if len(commits[commits[commitName]['parents'][0]]['children']) == 1:
-				if len(commits[commits[commitName]['parents'][0]]['branches']) == 0:
-					commits[commits[commitName]['parents'][0]]['branches'].update(commits[commitName]['branches'])
-			elif len(commits[commits[commitName]['parents'][0]]['children']) == 2:
-				for branchName in commits[commitName]['branches']:
-					if branchName in ['master', 'staging', 'production', 'origin/master', 'origin/staging', 'origin/production']:
-						commits[commits[commitName]['parents'][0]]['branches'].add(branchName)
-
-		# noBranchParentName = ''
-		# for parentName in commits[commitName]['parents']:
-			# if parentName in commits and branchName in commits[parentName]['branches']:
-				# noBranchParentName = ''
-				# break # the branch is already in a parent
-			# if parentName in commits and len(commits[parentName]['branches']) == 0:
-				# if noBranchParentName is not '':
-					# noBranchParentName = ''
-					# break # more than one parent with no branch
-				# noBranchParentName = parentName
-		# if noBranchParentName is not '':
-			# commits[noBranchParentName]['branches'].add(branchName)
-
-# propogate the branches to the descendants
-# for date in sorted(commitsByDate.keys(), reverse=False):
-	# commitName = commitsByDate[date]
-	# for branchName in commits[commitName]['branches']:
-		# noBranchChildName = ''
-		# for childName in commits[commitName]['children']:
-			# if childName in commits and branchName in commits[childName]['branches']:
-				# noBranchChildName = ''
-				# break # the branch is already in a child
-			# if childName in commits and len(commits[childName]['branches']) == 0:
-				# if noBranchChildName is not '':
-					# noBranchChildName = ''
-					# break # more than one child with no branch
-				# noBranchChildName = childName
-		# if noBranchChildName is not '':
-			# commits[noBranchChildName]['branches'].add(branchName)
-
-# get commit levels
-maxLevel = 0
-count = 0
-for date in sorted(commitsByDate.keys(), reverse=True):
-	commitName = commitsByDate[date]
-	commits[commitName]['level'] = count
-	count = count + 1
-	# for parentCommitName in commits[commitName]['parents']:
-		# if parentCommitName in commits:
-			# commits[parentCommitName]['level'] = max(commits[parentCommitName]['level'], commits[commitName]['level'] + 1)
-	maxLevel = max(maxLevel, commits[commitName]['level'])
+for commit in order:
+	if commitstore.numParents(store, commit) == 1 and not commitstore.isStub(store, commitstore.parents(store, commit)[0]):
+		parent = commitstore.parents(store, commit)[0]
+		if commitstore.numChildren(store, parent) == 1:
+			if len(branchesOf(parent)) == 0:
+				addBranches(parent, branchesOf(commit))
+		elif commitstore.numChildren(store, parent) == 2:
+			for branchName in branchesOf(commit):
+				if branchName in ['master', 'staging', 'production', 'origin/master', 'origin/staging', 'origin/production']:
+					addBranches(parent, [branchName])
+
+# get commit levels, which are their places in the order
+levels = array.array('l', [0]) * numStoreCommits
+for index in range(0, len(order)):
+	levels[order[index]] = index
+maxLevel = max(len(order) - 1, 0)
 
 # get node text for each commit
-for commitName in commits:
-	commits[commitName]['nodetext'] = commits[commitName]['name'][:8] + ' ' + str(commits[commitName]['date'])
-
-# print html
+def nodeText (commit):
+	return commitstore.name(store, commit)[:8] + ' ' + str(commitstore.date(store, commit))
+
+# lay out the commits, newest on the left, each in a lane like git log --graph
+runstats.phase('lanes')
+(lanes, edgeLanes) = commitstore.assignLanes(store, order)
+numLanes = max(lanes) + 1 if len(lanes) > 0 else 1
+levelSpacing = 100
+laneSpacing = 60
+margin = 40
+laneColors = ['#3366cc', '#dc3912', '#ff9900', '#109618', '#990099', '#0099c6', '#dd4477', '#66aa00']
+
+def nodePoint (commit):
+	return [margin + levels[commit] * levelSpacing, margin + lanes[commit] * laneSpacing]
+
+# print html, with the graph as a static svg so that the browser has no layout to do
+runstats.phase('page')
 f = open('html/git-view.html', 'w')
-print('<html><body>', file = f )
-
-# print graph
-print('''
-<script type="text/javascript" src="js/jquery-1.4.2.min.js"></script>
-<script type="text/javascript" src="js/raphael-min.js"></script>
-<script type="text/javascript" src="js/dracula_graffle.js"></script>
-<script type="text/javascript" src="js/dracula_graph.js"></script>
-<script type="text/javascript">
-<!--
-
-var redraw;
-var height = ''' + str(len(branchNames) * 60) + ''';
-var width = ''' + str(maxLevel * 100) + ''';
-
-/* only do all this when document has finished loading (needed for RaphaelJS */
-window.onload = function()
-{
-	var g = new Graph();
-	var levels = {};
-
-''', file = f)
-
-for commitName in commits:
-	print('''
-		node = g.addNode("''' + commits[commitName]['nodetext'] + '''");
-		node.innerid = "''' + ' '.join(commits[commitName]['branches']) + '''";
-		''', file = f)
-#	print(','.join(commits[commitName]['HEAD']))
-
-for commitName in commits:
-	for parentCommitName in commits[commitName]['parents']:
-		if parentCommitName in commits:
-			print('g.addEdge("' + commits[parentCommitName]['nodetext'] + '", "' + commits[commitName]['nodetext'] + '", { directed : true } );', file = f)
-
-for commitName in commits:
-	print('levels["' + commits[commitName]['nodetext'] + '"] = ' + str(commits[commitName]['level']) + ';', file = f)
-
-print('''
-	/* layout the graph using the Spring layout implementation */
-	var layouter = new Graph.Layout.Leveled(g, levels);
-	layouter.layout();
-
-	/* draw the graph using the RaphaelJS draw implementation */
-	var renderer = new Graph.Renderer.Raphael('canvas', g, width, height);
-	renderer.draw();
-
-	redraw = function()
-	{
-		layouter.layout();
-		renderer.draw();
-	};
-};
-
--->
-</script>
-<div id="canvas"></div>
-<div id='console'></div>
-<button id="redraw" onclick="redraw();">redraw</button>
-''', file = f)
-
-# print top of table
+print('<html><body>', file = f)
+print('<svg xmlns="http://www.w3.org/2000/svg" width="' + str(2 * margin + maxLevel * levelSpacing) + '" height="' + str(2 * margin + (numLanes - 1) * laneSpacing) + '" font-family="sans-serif" font-size="10" text-anchor="middle">', file = f)
+
+# print the edges, each leaving the child and then running in its lane over to the parent
+print('<g fill="none" stroke-width="2">', file = f)
+for commit in order:
+	for parent in commitstore.parents(store, commit):
+		(childX, childY) = nodePoint(commit)
+		(parentX, parentY) = nodePoint(parent)
+		edgeY = margin + edgeLanes[(commit, parent)] * laneSpacing
+		points = [[childX, childY]]
+		if edgeY != childY:
+			points.append([childX + levelSpacing // 2, edgeY])
+		if edgeY != parentY:
+			points.append([parentX - levelSpacing // 2, edgeY])
+		points.append([parentX, parentY])
+		print('<path stroke="' + laneColors[edgeLanes[(commit, parent)] % len(laneColors)] + '" d="M' + ' L'.join([str(x) + ' ' + str(y) for (x, y) in points]) + '"/>', file = f)
+print('</g>', file = f)
+
+# print the nodes, with their branches above and their names and dates below
+for commit in order:
+	(x, y) = nodePoint(commit)
+	color = laneColors[lanes[commit] % len(laneColors)]
+	branchText = ' '.join(sorted(branchesOf(commit)))
+	print('<circle cx="' + str(x) + '" cy="' + str(y) + '" r="5" fill="' + color + '"/>', file = f)
+	if branchText != '':
+		print('<text x="' + str(x) + '" y="' + str(y - 10) + '">' + html.escape(branchText) + '</text>', file = f)
+	print('<text x="' + str(x) + '" y="' + str(y + 18) + '">' + html.escape(nodeText(commit)) + '</text>', file = f)
+
+print('</svg>', file = f)
 print('</body></html>', file = f)
-
+f.close()
+
+if recordStats:
+	runstats.count('commits', numStoreCommits)
+	runstats.count('branches', len(branchNames))
+	runstats.count('lanes', numLanes)
+	runstats.count('cells', len(order) * numLanes)
+	runstats.write('html/git-view-stats.json', ['html/git-view.html'])
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+# renders the rows of git-view.py's page, each a branch's run-length encoded columns, which is most of the work of writing a
+# large page, so for views with many cells the rows are split into chunks that are rendered in worker processes
+# the chunks are joined in order, so the page is the same however many workers there are
+# the workers are forked, since spawned ones would run the script that started them again when they import it, and where
+# fork is not available, the rows are rendered without workers
+
+import concurrent.futures
+import json
+import multiprocessing
+import re
+
+# views with fewer cells than this are rendered without workers, since starting them would take longer than the rows
+minParallelCells = 1 << 22
+
+pool = None
+poolWorkers = 0
+canFork = 'fork' in multiprocessing.get_all_start_methods()
+
+# json that is safe to put inside a script element
+def scriptJson (value):
+	return json.dumps(value).replace('</', '<\\/')
+
+# the lengths of the alternating runs of columns without and with the bits of the row set, starting with a run without
+def bitRuns (row, numColumns):
+	if row == 0:
+		return []
+	bits = format(row, '0' + str(numColumns) + 'b')[::-1]
+	runs = [len(run) for run in re.findall('0+|1+', bits.rstrip('0'))]
+	if bits[0] == '1':
+		runs.insert(0, 0)
+	return runs
+
+# a row is [display, level, column of the latest commit or -1, row bits, number of columns], and anything after that is kept
+def renderRow (row):
+	return scriptJson([row[0], row[1], row[2], bitRuns(row[3], row[4])] + row[5:]) + ',\n'
+
+def renderChunk (rows):
+	return ''.join([renderRow(row) for row in rows])
+
+# the pool is started once and kept, so that a view that is served does not start it again for every update
+def workerPool (numWorkers):
+	global pool, poolWorkers
+	if pool is None or poolWorkers != numWorkers:
+		if pool is not None:
+			pool.shutdown()
+		pool = concurrent.futures.ProcessPoolExecutor(max_workers = numWorkers, mp_context = multiprocessing.get_context('fork'))
+		poolWorkers = numWorkers
+	return pool
+
+# starts the workers now, for a process that is about to start threads, since forking it once it has threads can deadlock
+# a forked pool starts all of its workers with the first chunk it is given
+def startWorkers (numWorkers):
+	if numWorkers > 1 and canFork:
+		workerPool(numWorkers).submit(renderChunk, []).result()
+
+# yields the rendered rows in order, a chunk at a time when there are workers
+def renderRows (rows, numWorkers):
+	numCells = sum([row[4] for row in rows])
+	if numWorkers <= 1 or not canFork or len(rows) < 2 or numCells < minParallelCells:
+		for row in rows:
+			yield renderRow(row)
+		return
+	# a few chunks for each worker, so that a worker with slow rows does not hold up the rest
+	chunkSize = (len(rows) + 4 * numWorkers - 1) // (4 * numWorkers)
+	yield from workerPool(numWorkers).map(renderChunk, [rows[i:i + chunkSize] for i in range(0, len(rows), chunkSize)])
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+# opt-in measurements of a run of git-view.py or node-view.py, written as json next to the html so that runs can be compared
+# a run is split into phases, each timed from its start to the start of the next, and git's work is counted by gitlog
+
+import json
+import os
+import resource
+import time
+import gitlog
+
+stats = None # the measurements so far, once started
+
+def start ():
+	global stats
+	stats = {}
+	stats['started'] = time.time()
+	stats['phases'] = {} # the name of each phase to its wall and cpu seconds, added up if it runs more than once
+	stats['phaseOrder'] = []
+	stats['counts'] = {}
+	stats['current'] = None # [name, wall time, cpu time] of the phase running now
+	phase('setup')
+
+# ends the phase that is running, if any, and starts the named one
+def phase (name):
+	if stats is None:
+		return
+	now = [time.perf_counter(), time.process_time()]
+	if stats['current'] is not None:
+		(currentName, wall, cpu) = stats['current']
+		if currentName not in stats['phases']:
+			stats['phases'][currentName] = {'wallSeconds': 0.0, 'cpuSeconds': 0.0}
+			stats['phaseOrder'].append(currentName)
+		stats['phases'][currentName]['wallSeconds'] += now[0] - wall
+		stats['phases'][currentName]['cpuSeconds'] += now[1] - cpu
+	stats['current'] = ([name] + now if name is not None else None)
+
+def count (name, value):
+	if stats is None:
+		return
+	stats['counts'][name] = value
+
+def pathSize (path):
+	if os.path.isfile(path):
+		return os.path.getsize(path)
+	size = 0
+	for (dirPath, dirNames, fileNames) in os.walk(path):
+		for fileName in fileNames:
+			size += os.path.getsize(os.path.join(dirPath, fileName))
+	return size
+
+# ends the last phase and writes everything measured to fileName, with the sizes of the output files or directories
+def write (fileName, outputPaths):
+	if stats is None:
+		return
+	phase(None)
+	report = {}
+	report['started'] = stats['started']
+	report['wallSeconds'] = sum([stats['phases'][name]['wallSeconds'] for name in stats['phaseOrder']])
+	report['cpuSeconds'] = sum([stats['phases'][name]['cpuSeconds'] for name in stats['phaseOrder']])
+	report['phases'] = [dict([('name', name)] + list(stats['phases'][name].items())) for name in stats['phaseOrder']]
+	report['git'] = gitlog.gitCalls
+	report['gitCpuSeconds'] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_utime + resource.getrusage(resource.RUSAGE_CHILDREN).ru_stime
+	report['peakRssKilobytes'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss # kilobytes on linux, bytes on macos
+	report['peakGitRssKilobytes'] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+	report['counts'] = stats['counts']
+	report['outputBytes'] = dict([(os.path.basename(path), pathSize(path)) for path in outputPaths if os.path.exists(path)])
+	with open(fileName, 'w', encoding = 'UTF-8') as f:
+		json.dump(report, f, indent = '\t')
+		f.write('\n')
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+# the branch and commit matrix of git-view.py, for other tools to read without running git or reading the page
+# it is written as json lines, a line per column and per branch, or as a compact binary file with a bitmap per branch
+# a matrix holds:
+#   integration: the integration branch names, highest level first
+#   columns: [name, kind, level, date, commit] of each column, newest first, where kind is 'c' for a commit, 'm' for a merge
+#     and 't' for a tag, name is the tag name for tags and the commit name otherwise, and commit is the commit name
+#   branches: [name, display, local, head, level, latest, row] of each branch, in the order of the page, where latest is the
+#     column of its latest commit or -1, and bit c of the row is set when the branch has the commit of column c
+
+import json
+import struct
+import rowrender
+
+formatVersion = 1
+binaryMagic = b'GVMX'
+columnKinds = 'cmt'
+
+def newMatrix (integration):
+	matrix = {}
+	matrix['integration'] = integration
+	matrix['columns'] = []
+	matrix['branches'] = []
+	return matrix
+
+# the row of the runs of rowrender.bitRuns, the lengths of the alternating runs of columns without and with the bits set
+def runsRow (runs):
+	row = 0
+	c = 0
+	for i in range(0, len(runs)):
+		if i % 2 == 1:
+			row |= ((1 << runs[i]) - 1) << c
+		c += runs[i]
+	return row
+
+# writes the matrix as a line of json for the header, then a line for each column and each branch
+# the columns of a branch are given as runs, like the page
+def writeJsonLines (matrix, fileName):
+	with open(fileName, 'w', buffering = 1 << 20, encoding = 'UTF-8') as f:
+		f.write(json.dumps({'type': 'header', 'version': formatVersion, 'integration': matrix['integration'], 'numColumns': len(matrix['columns']), 'numBranches': len(matrix['branches'])}) + '\n')
+		for c in range(0, len(matrix['columns'])):
+			(name, kind, level, date, commit) = matrix['columns'][c]
+			f.write(json.dumps({'type': 'column', 'column': c, 'name': name, 'kind': kind, 'level': level, 'date': date, 'commit': commit}) + '\n')
+		for (name, display, local, head, level, latest, row) in matrix['branches']:
+			f.write(json.dumps({'type': 'branch', 'name': name, 'display': display, 'local': local, 'head': head, 'level': level, 'latest': latest, 'runs': rowrender.bitRuns(row, len(matrix['columns']))}) + '\n')
+
+def readJsonLines (fileName):
+	matrix = None
+	with open(fileName, encoding = 'UTF-8') as f:
+		for line in f:
+			item = json.loads(line)
+			if item['type'] == 'header':
+				matrix = newMatrix(item['integration'])
+			elif item['type'] == 'column':
+				matrix['columns'].append([item['name'], item['kind'], item['level'], item['date'], item['commit']])
+			elif item['type'] == 'branch':
+				matrix['branches'].append([item['name'], item['display'], item['local'], item['head'], item['level'], item['latest'], runsRow(item['runs'])])
+	return matrix
+
+# the binary file is little-endian, and strings are a u16 length and then UTF-8:
+#   'GVMX', u32 version, u32 number of columns, u32 number of branches, u8 length of a commit name in bytes,
+#     u8 number of integration branches and then their names
+#   for each column: u8 kind (0 commit, 1 merge, 2 tag), u8 level, i64 date, the commit name in binary, and the tag name
+#     (empty for commits)
+#   for each branch: its name, its display name, u8 1 if local, u8 level, i32 latest column, the head in binary, and its row
+#     as a bitmap of (number of columns + 7) / 8 bytes, with column c in bit c % 8 of byte c / 8
+def writeString (f, text):
+	data = text.encode('UTF-8')
+	f.write(struct.pack('<H', len(data)))
+	f.write(data)
+
+def writeBinary (matrix, fileName):
+	columns = matrix['columns']
+	nameLength = (len(bytes.fromhex(columns[0][4])) if len(columns) > 0 else 20)
+	rowLength = (len(columns) + 7) // 8
+	with open(fileName, 'wb', buffering = 1 << 20) as f:
+		f.write(binaryMagic + struct.pack('<IIIBB', formatVersion, len(columns), len(matrix['branches']), nameLength, len(matrix['integration'])))
+		for branchName in matrix['integration']:
+			writeString(f, branchName)
+		for (name, kind, level, date, commit) in columns:
+			f.write(struct.pack('<BBq', columnKinds.index(kind), level, date))
+			f.write(bytes.fromhex(commit))
+			writeString(f, (name if kind == 't' else ''))
+		for (name, display, local, head, level, latest, row) in matrix['branches']:
+			writeString(f, name)
+			writeString(f, display)
+			f.write(struct.pack('<BBi', (1 if local else 0), level, latest))
+			f.write(bytes.fromhex(head))
+			f.write(row.to_bytes(rowLength, 'little'))
+
+def readBinary (fileName):
+	with open(fileName, 'rb') as f:
+		data = f.read()
+	if data[:4] != binaryMagic:
+		raise ValueError(fileName + ' is not a matrix file')
+	(version, numColumns, numBranches, nameLength, numIntegration) = struct.unpack_from('<IIIBB', data, 4)
+	if version != formatVersion:
+		raise ValueError(fileName + ' has version ' + str(version) + ', not ' + str(formatVersion))
+	offset = 18
+	def readString ():
+		nonlocal offset
+		length = struct.unpack_from('<H', data, offset)[0]
+		offset += 2 + length
+		return data[offset - length:offset].decode('UTF-8')
+	matrix = newMatrix([readString() for i in range(0, numIntegration)])
+	for c in range(0, numColumns):
+		(kind, level, date) = struct.unpack_from('<BBq', data, offset)
+		offset += 10
+		commit = data[offset:offset + nameLength].hex()
+		offset += nameLength
+		tagName = readString()
+		matrix['columns'].append([(tagName if kind == 2 else commit), columnKinds[kind], level, date, commit])
+	rowLength = (numColumns + 7) // 8
+	for b in range(0, numBranches):
+		name = readString()
+		display = readString()
+		(local, level, latest) = struct.unpack_from('<BBi', data, offset)
+		offset += 6
+		head = data[offset:offset + nameLength].hex()
+		offset += nameLength
+		row = int.from_bytes(data[offset:offset + rowLength], 'little')
+		offset += rowLength
+		matrix['branches'].append([name, display, local == 1, head, level, latest, row])
+	return matrix
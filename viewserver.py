@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+# serves a generated view over http and pushes updates to the open pages as server-sent events,
+# while the refs of the repo are watched for changes
+
+import http.server
+import os
+import queue
+import threading
+import time
+import nativegit
+
+keepAliveInterval = 15 # seconds between the comments sent to keep idle event streams open
+
+# starts serving the files in directory on the port in the background, with /events as the stream of updates
+def startServer (directory, port):
+	server = {}
+	server['clients'] = [] # a queue of events for each open page
+	server['kept'] = {} # the last data of each event that is also sent to pages as they connect
+	server['lock'] = threading.Lock()
+	class Handler (http.server.SimpleHTTPRequestHandler):
+		def __init__ (self, *args, **kwargs):
+			super().__init__(*args, directory = directory, **kwargs)
+		def log_message (self, format, *args):
+			pass
+		def end_headers (self):
+			self.send_header('Cache-Control', 'no-cache')
+			super().end_headers()
+		def do_GET (self):
+			if self.path.split('?')[0] != '/events':
+				return super().do_GET()
+			self.send_response(200)
+			self.send_header('Content-Type', 'text/event-stream')
+			self.end_headers()
+			events = queue.Queue()
+			with server['lock']:
+				server['clients'].append(events)
+				for event in server['kept']:
+					events.put((event, server['kept'][event]))
+			try:
+				while True:
+					try:
+						(event, data) = events.get(timeout = keepAliveInterval)
+						self.wfile.write(('event: ' + event + '\ndata: ' + data + '\n\n').encode('UTF-8'))
+					except queue.Empty:
+						self.wfile.write(b': keep alive\n\n')
+					self.wfile.flush()
+			except (BrokenPipeError, ConnectionResetError):
+				pass
+			finally:
+				with server['lock']:
+					server['clients'].remove(events)
+	httpServer = http.server.ThreadingHTTPServer(('localhost', port), Handler)
+	httpServer.daemon_threads = True
+	server['http'] = httpServer
+	threading.Thread(target = httpServer.serve_forever, daemon = True).start()
+	return server
+
+# sends the event, with data on a single line like json, to every open page, and if keep, to every page that connects later too
+def broadcast (server, event, data, keep = False):
+	with server['lock']:
+		if keep:
+			server['kept'][event] = data
+		for events in server['clients']:
+			events.put((event, data))
+
+# a signature of the refs of the repo, which changes whenever a ref is added, moved or deleted,
+# since git writes each ref by renaming a new file into its directory
+def refsSignature (gitDir):
+	gitDir = nativegit.commonDir(gitDir)
+	signature = []
+	for fileName in [os.path.join(gitDir, 'packed-refs'), os.path.join(gitDir, 'HEAD')]:
+		if os.path.exists(fileName):
+			signature.append((fileName, os.stat(fileName).st_mtime_ns))
+	for (dirPath, dirNames, fileNames) in os.walk(os.path.join(gitDir, 'refs')):
+		signature.append((dirPath, os.stat(dirPath).st_mtime_ns))
+	return signature
+
+# calls onChange whenever the refs change, checking every interval seconds, until interrupted
+def watchRefs (gitDir, onChange, interval = 0.2):
+	lastSignature = refsSignature(gitDir)
+	while True:
+		time.sleep(interval)
+		signature = refsSignature(gitDir)
+		if signature != lastSignature:
+			lastSignature = signature
+			onChange()